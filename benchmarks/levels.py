@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Load every shipped level and worldmap, then simulate each level for a
+# number of frames with the player running right and jumping, and write
+# the results as a JSON report.  The report's keys are sorted, so the
+# reports of two commits can be compared with any diff tool to catch
+# regressions in the map loader or the step loop.
+
+
+import argparse
+import json
+import os
+import time
+import tracemalloc
+
+from tile_decode import ROOTDIR, import_retux
+
+
+def forget_map(retux, fname):
+    # Make sure the next load of map ``fname`` reads it again.
+    retux.current_areas.pop(fname, None)
+    retux.loaded_levels.pop(fname, None)
+    retux.loaded_worldmaps.pop(fname, None)
+
+
+def count_types(retux, room):
+    # Return the number of objects in ``room`` by their key in TYPES.
+    # Objects of classes not in TYPES are counted by class name.
+    names = {cls: key for key, cls in retux.TYPES.items()}
+    counts = {}
+    for obj in room.objects:
+        name = names.get(type(obj), type(obj).__name__)
+        counts[name] = counts.get(name, 0) + 1
+
+    return counts
+
+
+def load_stats(retux, cls, fname, repeat):
+    # Load map ``fname`` with ``cls.load`` and return its load time,
+    # object counts and the peak memory allocated while loading it.
+    # Tilesets are shared between maps and only loaded once, so the
+    # first load isn't timed.
+    forget_map(retux, fname)
+    room = cls.load(fname)
+    if room is None:
+        return {"error": "could not load"}
+
+    times = []
+    for i in range(repeat):
+        forget_map(retux, fname)
+        start = time.perf_counter()
+        cls.load(fname)
+        times.append(time.perf_counter() - start)
+
+    forget_map(retux, fname)
+    tracemalloc.start()
+    cls.load(fname)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    forget_map(retux, fname)
+
+    return {"load_ms": round(min(times) * 1000, 3),
+            "peak_memory": peak, "objects": len(room.objects),
+            "types": count_types(retux, room)}
+
+
+def simulate(retux, fnames, frames):
+    # Play each level in ``fnames`` for ``frames`` frames in a single
+    # run of the game loop and return the results for each level.
+    import sge
+
+    results = {}
+    todo = list(fnames)
+
+    class Bench:
+        # The level being simulated.  This is kept apart from the
+        # rooms, since warps load a level's other areas as new rooms.
+        fname = None
+        level = None
+        level_frames = 0
+        level_start = 0
+        players = None
+
+    bench = Bench()
+
+    class BenchLevel(retux.LevelTester):
+
+        def return_to_map(self):
+            next_level()
+
+        def win_game(self):
+            next_level()
+
+        def event_alarm(self, alarm_id):
+            if alarm_id == "death":
+                next_level()
+            else:
+                super().event_alarm(alarm_id)
+
+        def event_step(self, time_passed, delta_mult):
+            # A level which ends during a frame still finishes that
+            # frame, and the next level only becomes the current room
+            # at the start of the next one, so nothing is counted until
+            # the next level has started.
+            level = bench.level
+            if bench.players is None and self is level:
+                bench.players = [obj for obj in self.objects
+                                 if isinstance(obj, retux.Player)]
+                bench.level_start = time.perf_counter()
+
+            if bench.players is not None:
+                # Hold right the whole time and jump every other half
+                # second.
+                mask = retux.INPUT_RIGHT
+                if (bench.level_frames // (retux.FPS // 2)) % 2:
+                    mask |= retux.INPUT_JUMP
+                for obj in bench.players:
+                    obj.human = False
+                    obj.set_input_mask(mask)
+
+            super().event_step(time_passed, delta_mult)
+
+            if bench.players is not None and bench.level is level:
+                bench.level_frames += 1
+                if bench.level_frames >= frames:
+                    next_level()
+
+    def start_level():
+        # Start the next level in ``todo`` that loads and return it, or
+        # end the game if there are none left.
+        while todo:
+            bench.fname = todo.pop(0)
+            forget_map(retux, bench.fname)
+            level = BenchLevel.load(bench.fname)
+            if level is not None:
+                bench.level = level
+                bench.level_frames = 0
+                bench.players = None
+                level.start()
+                return level
+
+            results[bench.fname] = {"error": "could not load"}
+
+        bench.fname = None
+        bench.level = None
+        sge.game.end()
+
+    def next_level():
+        # Record the results of the current level and start the next.
+        if bench.fname is None:
+            return
+
+        t = time.perf_counter() - bench.level_start
+        position = None
+        for obj in bench.players or []:
+            position = [round(obj.x), round(obj.y)]
+            break
+
+        results[bench.fname] = {
+            "frames": bench.level_frames,
+            "step_ms": round(1000 * t / max(1, bench.level_frames), 3),
+            "player": position}
+        start_level()
+
+    sge.game.start_room = start_level()
+    if sge.game.start_room is not None:
+        sge.game.start()
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark loading and simulating every level.")
+    parser.add_argument("-f", "--frames", type=int, default=300,
+                        help="How many frames to simulate each level for.")
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+                        help="How many times to load each map; the fastest "
+                             "load is reported.")
+    parser.add_argument("-o", "--output", default="levels_report.json",
+                        help="Where to write the report (default: "
+                             "levels_report.json).")
+    parser.add_argument(
+        "levels", nargs="*",
+        help="The levels to benchmark (default: all levels and worldmaps).")
+    args = parser.parse_args()
+
+    # Run without graphics or sound, and never stop for an error
+    # message.
+    retux = import_retux(["--headless"])
+    retux.show_error = print
+
+    levels = args.levels
+    worldmaps = []
+    if not levels:
+        d = os.path.join(ROOTDIR, "data", "levels")
+        levels = sorted(fname for fname in os.listdir(d)
+                        if fname.endswith(".json"))
+        d = os.path.join(ROOTDIR, "data", "worldmaps")
+        worldmaps = sorted(fname for fname in os.listdir(d)
+                           if fname.endswith(".json"))
+
+    report = {"frames": args.frames, "levels": {}, "worldmaps": {}}
+    for fname in levels:
+        print("Loading level {}".format(fname))
+        report["levels"][fname] = load_stats(retux, retux.Level, fname,
+                                             args.repeat)
+    for fname in worldmaps:
+        print("Loading worldmap {}".format(fname))
+        report["worldmaps"][fname] = load_stats(retux, retux.Worldmap, fname,
+                                                args.repeat)
+
+    print("Simulating {} levels".format(len(levels)))
+    start = time.perf_counter()
+    results = simulate(retux, levels, args.frames)
+    print("Simulated in {:.1f} seconds".format(time.perf_counter() - start))
+    for fname in results:
+        report["levels"][fname].update(results[fname])
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4, sort_keys=True)
+        f.write("\n")
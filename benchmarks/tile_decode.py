@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Compare ReTux's tile layer decoder (compile_levels.decode_tiles) with
+# the per-byte loop used by xsge_tiled on the largest shipped levels.
+
+
+import argparse
+import base64
+import gzip
+import json
+import os
+import sys
+import timeit
+import zlib
+
+
+FILEDIR = os.path.dirname(os.path.abspath(__file__))
+ROOTDIR = os.path.dirname(FILEDIR)
+
+
+def loop_decode(data, encoding, compression):
+    # The decoder ReTux used to use, kept here as the baseline.
+    if isinstance(data, str):
+        if encoding == "csv":
+            return [int(i) for i in data.strip().split(",")]
+        elif encoding == "base64":
+            data = base64.b64decode(data.strip().encode("latin1"))
+
+            if compression == "gzip":
+                data = gzip.decompress(data)
+            elif compression == "zlib":
+                data = zlib.decompress(data)
+            elif compression:
+                e = 'Compression type "{}" not supported.'.format(compression)
+                raise ValueError(e)
+
+            ndata = [i for i in data]
+
+            data = []
+            for i in range(0, len(ndata), 4):
+                n = (ndata[i]  + ndata[i + 1] * (2 ** 8) +
+                     ndata[i + 2] * (2 ** 16) + ndata[i + 3] * (2 ** 24))
+                data.append(n)
+
+            return data
+        else:
+            e = 'Encoding type "{}" not supported.'.format(encoding)
+            raise ValueError(e)
+    else:
+        return data
+
+
+def get_layers(layers):
+    for layer in layers:
+        if layer.get("type") == "group":
+            yield from get_layers(layer.get("layers", []))
+        elif layer.get("type") == "tilelayer":
+            for part in [layer] + layer.get("chunks", []):
+                if "data" in part:
+                    yield (part["data"], layer.get("encoding", "csv"),
+                           layer.get("compression"))
+
+
+def import_retux(args=()):
+    # Importing ReTux starts its game system, so keep it off-screen and
+    # stop it from parsing our command-line arguments or taking over
+    # stderr.  ``args`` are passed to ReTux as its command-line
+    # arguments.
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    argv = sys.argv
+    sys.argv = argv[:1] + ["--print-errors"] + list(args)
+    sys.path.insert(0, ROOTDIR)
+    try:
+        import retux
+    finally:
+        sys.argv = argv
+    return retux
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the tile layer decoders on the largest levels.")
+    parser.add_argument("-n", "--levels", type=int, default=5,
+                        help="How many of the largest levels to use.")
+    parser.add_argument("-r", "--repeat", type=int, default=20,
+                        help="How many times to decode each level.")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOTDIR)
+    from compile_levels import decode_tiles
+
+    d = os.path.join(ROOTDIR, "data", "levels")
+    fnames = [os.path.join(d, fname) for fname in os.listdir(d)
+              if fname.endswith(".json")]
+    fnames.sort(key=os.path.getsize, reverse=True)
+
+    print("{:<24} {:>8} {:>12} {:>12} {:>8}".format(
+        "Level", "Tiles", "Loop (ms)", "Array (ms)", "Speedup"))
+    for fname in fnames[:args.levels]:
+        with open(fname) as f:
+            layers = list(get_layers(json.load(f).get("layers", [])))
+
+        ntiles = 0
+        for layer in layers:
+            new = decode_tiles(*layer)
+            old = loop_decode(*layer)
+            assert list(new) == list(old), fname
+            ntiles += len(new)
+
+        loop_time = timeit.timeit(
+            lambda: [loop_decode(*layer) for layer in layers],
+            number=args.repeat) / args.repeat
+        array_time = timeit.timeit(
+            lambda: [decode_tiles(*layer) for layer in layers],
+            number=args.repeat) / args.repeat
+
+        print("{:<24} {:>8} {:>12.3f} {:>12.3f} {:>7.1f}x".format(
+            os.path.basename(fname), ntiles, loop_time * 1000,
+            array_time * 1000, loop_time / array_time))
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Measure how long skipping to the middle of synthetic timelines of
+# different sizes takes, compared to the sort-and-pop approach ReTux
+# used to use.
+
+
+import argparse
+import timeit
+
+from tile_decode import import_retux
+
+
+def pop_skipto(timeline, step):
+    # The skip ReTux used to use, kept here as the baseline.
+    t_keys = sorted(timeline.keys())
+    while t_keys and t_keys[0] < step:
+        i = t_keys.pop(0)
+        timeline[i] = []
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare timeline skip times on synthetic timelines.")
+    parser.add_argument("-r", "--repeat", type=int, default=1000,
+                        help="How many times to skip in each timeline.")
+    args = parser.parse_args()
+
+    retux = import_retux()
+    level = retux.Level.load("test.json")
+
+    print("{:>8} {:>12} {:>12}".format("Steps", "Pop (us)", "Bisect (us)"))
+    for size in [1000, 10000, 100000]:
+        jt = {str(i): ["setattr player right_pressed {}".format(i % 2)]
+              for i in range(size)}
+        timeline = retux.compile_timeline(jt)
+        keys = tuple(sorted(timeline.keys()))
+        target = size / 2
+
+        old_timeline = {i: [] for i in keys}
+        pop_time = timeit.timeit(lambda: pop_skipto(old_timeline, target),
+                                 number=1)
+
+        def skip():
+            level.timeline = timeline
+            level.timeline_keys = keys
+            level.timeline_cursor = 0
+            level.timeline_command = 0
+            level.timeline_skipto(target)
+
+        skip()
+        assert keys[level.timeline_cursor] == target
+        bisect_time = timeit.timeit(skip, number=args.repeat) / args.repeat
+
+        print("{:>8} {:>12.1f} {:>12.2f}".format(size, pop_time * 1e6,
+                                                 bisect_time * 1e6))
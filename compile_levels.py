@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Compile Tiled JSON levels and worldmaps into ReTux's binary map format.
+#
+# A compiled map is stored next to its JSON source with the extension
+# ".rtxl" and consists of:
+#
+# - The magic bytes "RTXL".
+# - The format version as a little-endian unsigned 16-bit integer.
+# - The length of the header as a little-endian unsigned 32-bit integer.
+# - The header: UTF-8 JSON holding the size and CRC-32 of the JSON
+#   source ("source") and the map itself ("map"), in which the "data"
+#   of every tile layer and chunk is replaced with an [offset, count]
+#   pair ("rtxl_data") into the tile array.
+# - The tile array: every tile GID as a little-endian unsigned 32-bit
+#   integer.
+#
+# ReTux uses a compiled map instead of the JSON source as long as the
+# source's size and CRC-32 still match; otherwise it falls back to the
+# JSON source, so compiled maps never need to be deleted by hand.
+
+
+import argparse
+import array
+import base64
+import gzip
+import json
+import os
+import struct
+import sys
+import zlib
+
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        import zstandard as zstd
+    except ImportError:
+        zstd = None
+
+
+if getattr(sys, "frozen", False):
+    __file__ = sys.executable
+
+FILEDIR = os.path.dirname(__file__)
+COMPILED_MAP_MAGIC = b"RTXL"
+COMPILED_MAP_VERSION = 1
+
+# Tile GIDs are unsigned 32-bit integers.  'I' is 32 bits wide almost
+# everywhere, but the C standard only promises 16.
+TILE_TYPECODE = 'I' if array.array('I').itemsize == 4 else 'L'
+assert array.array(TILE_TYPECODE).itemsize == 4
+
+
+def decode_tiles(data, encoding, compression):
+    """
+    Return the tile GIDs in the data of a Tiled tile layer as an array.
+    ``encoding`` can be ``"csv"`` or ``"base64"``, and ``compression``
+    can be ``"gzip"``, ``"zlib"``, ``"zstd"`` (if a zstd module is
+    available) or :const:`None`.  Data which isn't a string is taken
+    to be a list of GIDs already.
+    """
+    tiles = array.array(TILE_TYPECODE)
+    if isinstance(data, str):
+        if encoding == "csv":
+            tiles.extend(int(i) for i in data.strip().split(","))
+        elif encoding == "base64":
+            data = base64.b64decode(data.strip().encode("latin1"))
+            if compression == "gzip":
+                data = gzip.decompress(data)
+            elif compression == "zlib":
+                data = zlib.decompress(data)
+            elif compression == "zstd" and zstd is not None:
+                data = zstd.decompress(data)
+            elif compression:
+                e = 'Compression type "{}" not supported.'.format(compression)
+                raise ValueError(e)
+
+            # Tiled stores GIDs as little-endian unsigned 32-bit
+            # integers.
+            tiles.frombytes(data)
+            if sys.byteorder == "big":
+                tiles.byteswap()
+        else:
+            e = 'Encoding type "{}" not supported.'.format(encoding)
+            raise ValueError(e)
+    else:
+        tiles.extend(data)
+
+    return tiles
+
+
+def compile_layers(layers, tiles):
+    for layer in layers:
+        if layer.get("type") == "group":
+            compile_layers(layer.get("layers", []), tiles)
+        elif layer.get("type") == "tilelayer":
+            encoding = layer.pop("encoding", "csv")
+            compression = layer.pop("compression", None)
+            for part in [layer] + layer.get("chunks", []):
+                if "data" in part:
+                    data = decode_tiles(part.pop("data"), encoding,
+                                        compression)
+                    part["rtxl_data"] = [len(tiles), len(data)]
+                    tiles.extend(data)
+
+
+def compile_map(fname):
+    """
+    Compile the Tiled JSON map ``fname`` and return the name of the
+    compiled file.
+    """
+    with open(fname, 'rb') as f:
+        source = f.read()
+
+    tilemap = json.loads(source.decode("utf-8"))
+    tiles = array.array(TILE_TYPECODE)
+    compile_layers(tilemap.get("layers", []), tiles)
+    if sys.byteorder == "big":
+        tiles.byteswap()
+
+    header = json.dumps({"source": [len(source), zlib.crc32(source)],
+                         "map": tilemap}, separators=(',', ':'))
+    header = header.encode("utf-8")
+
+    new_fname = os.path.splitext(fname)[0] + ".rtxl"
+    with open(new_fname, 'wb') as f:
+        f.write(COMPILED_MAP_MAGIC)
+        f.write(struct.pack("<HI", COMPILED_MAP_VERSION, len(header)))
+        f.write(header)
+        f.write(tiles.tobytes())
+
+    return new_fname
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compile Tiled JSON maps into ReTux's binary map format.")
+    parser.add_argument(
+        "files", nargs="*",
+        help="The maps to compile (default: all levels and worldmaps).")
+    args = parser.parse_args()
+
+    fnames = args.files
+    if not fnames:
+        for d in ["levels", "worldmaps"]:
+            d = os.path.join(FILEDIR, "data", d)
+            for fname in sorted(os.listdir(d)):
+                if fname.endswith(".json"):
+                    fnames.append(os.path.join(d, fname))
+
+    for fname in fnames:
+        try:
+            new_fname = compile_map(fname)
+        except (OSError, ValueError) as e:
+            print('Could not compile "{}": {}'.format(fname, e))
+        else:
+            print('Compiled "{}" to "{}"'.format(fname, new_fname))
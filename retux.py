@@ -20,21 +20,28 @@ __version__ = "1.6.3a0"
 
 
 import argparse
+import array
+import bisect
+import collections
 import datetime
 import gettext
+import heapq
 import itertools
 import json
 import math
 import os
+import queue
 import random
-import shutil
+import struct
 import sys
-import tempfile
+import threading
 import time
 import traceback
+import types
 import warnings
 import weakref
 import zipfile
+import zlib
 
 import sge
 import xsge_gui
@@ -43,6 +50,9 @@ import xsge_path
 import xsge_physics
 import xsge_tiled
 
+from compile_levels import (COMPILED_MAP_MAGIC, COMPILED_MAP_VERSION,
+                            TILE_TYPECODE, decode_tiles)
+
 try:
     from tkinter import Tk
     import tkinter.filedialog as tkinter_filedialog
@@ -55,7 +65,6 @@ else:
 if getattr(sys, "frozen", False):
     __file__ = sys.executable
 
-DATA = tempfile.mkdtemp("retux-data")
 CONFIG = os.path.join(
     os.getenv("XDG_CONFIG_HOME", os.path.join(os.path.expanduser("~"),
                                               ".config")), "retux")
@@ -65,6 +74,9 @@ LOCAL = os.path.join(
 
 dirs = [os.path.join(os.path.dirname(__file__), "data"),
         os.path.join(LOCAL, "data")]
+SPRITE_CACHE_DIR = os.path.join(LOCAL, "cache", "sprites")
+RECORDING_MAGIC = b"RTXR"
+RECORDING_VERSION = 1
 
 gettext.install("retux", os.path.abspath(os.path.join(dirs[0], "locale")),
                 names=["ngettext", "pgettext"])
@@ -95,6 +107,23 @@ parser.add_argument(
     "--record",
     help=_("Start the indicated level and record player actions in a "
            "timeline. Useful for making cutscenes."))
+parser.add_argument(
+    "--replay",
+    help=_("Play back a recording of player actions saved with --record."))
+parser.add_argument(
+    "--headless",
+    help=_("Play back the recording given with --replay as fast as possible "
+           "without a window, graphics or sound, then report how fast it "
+           "ran. Implies --nodelta."),
+    action="store_true")
+parser.add_argument(
+    "--profile",
+    help=_("Show how long each part of every frame takes."),
+    action="store_true")
+parser.add_argument(
+    "--profile-out",
+    help=_("Save how long each part of every frame took to the indicated "
+           "file in Chrome's trace event format."))
 parser.add_argument(
     "--no-backgrounds",
     help=_("Only show solid colors for backgrounds (uses less RAM)."),
@@ -106,11 +135,22 @@ parser.add_argument("--god", help=_("Pray to your god. Choose wisely…"))
 args = parser.parse_args()
 
 PRINT_ERRORS = args.print_errors
-DELTA = not args.nodelta
+HEADLESS = args.headless
+DELTA = not args.nodelta and not HEADLESS
 if args.datadir:
     dirs[0] = args.datadir
 LEVEL = args.level
 RECORD = args.record
+REPLAY = args.replay
+if HEADLESS:
+    # Scripts which import ReTux, like the benchmarks, can run it
+    # headless without a recording.
+    if not REPLAY and __name__ == "__main__":
+        parser.error(_("--headless requires --replay."))
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+PROFILE = args.profile
+PROFILE_OUT = args.profile_out
 NO_BACKGROUNDS = args.no_backgrounds
 NO_HUD = args.no_hud
 GOD = False
@@ -121,27 +161,345 @@ if args.god:
     elif args.god.lower() in {"emacs", "vi", "vim", "ed"}:
         HELL = True
 
-for d in dirs:
-    if os.path.isdir(d):
-        for dirpath, dirnames, filenames in os.walk(d, True, None, True):
-            dirtail = os.path.relpath(dirpath, d)
-            nd = os.path.join(DATA, dirtail)
+data_files = {}
+data_listing = {}
+loaded_tilesets = {}
+
+
+def index_data():
+    # Build the index of the data directories.  Files in later
+    # directories override files of the same name in earlier ones, so
+    # ``data_files`` maps every relative path to the file that should
+    # actually be used, without copying anything.
+    data_files.clear()
+    data_listing.clear()
+    loaded_tilesets.clear()
+
+    def index_dir(root, rel):
+        with os.scandir(os.path.join(root, rel)) as it:
+            for entry in it:
+                erel = os.path.join(rel, entry.name) if rel else entry.name
+                data_files[erel] = entry.path
+                data_listing.setdefault(rel, set()).add(entry.name)
+                if entry.is_dir():
+                    index_dir(root, erel)
+
+    for d in dirs:
+        if os.path.isdir(d):
+            index_dir(d, "")
+
+
+def data_path(*parts):
+    """
+    Return the real path of the data file indicated by ``parts``,
+    relative to the data directory.
+    """
+    rel = os.path.normpath(os.path.join(*parts))
+    return data_files.get(rel, os.path.join(dirs[0], rel))
+
+
+def data_listdir(*parts):
+    """Return a sorted list of the entries in the data directory."""
+    rel = os.path.normpath(os.path.join(*parts))
+    return sorted(data_listing.get(rel, ()))
+
+
+def sprite_files(d, name):
+    """
+    Return a sorted list of the data files (relative to the data
+    directory) that make up sprite ``name`` in data directory ``d``.
+    """
+    d = os.path.normpath(d)
+    files = []
+    for fname in data_listing.get(d, ()):
+        root, ext = os.path.splitext(fname)
+        if (root == name or root.rsplit('-', 1)[0] == name
+                or root.rsplit('_', 1)[0] == name):
+            files.append(os.path.join(d, fname))
+
+    return sorted(files)
+
+
+def sprite_dir(d, name):
+    # Return the real directory that sprite ``name`` in data directory
+    # ``d`` should be loaded from.  This mirrors the way sge.gfx.Sprite
+    # matches file names, so that overriding any one frame of a sprite
+    # overrides the whole sprite.
+    d = os.path.normpath(d)
+    candidates = {os.path.dirname(data_files[rel])
+                  for rel in sprite_files(d, name)}
+
+    for root in reversed(dirs):
+        real_d = os.path.join(root, d)
+        if real_d in candidates:
+            return real_d
+
+    return os.path.join(dirs[0], d)
+
+
+def load_sprite(name, d, **kwargs):
+    """Load sprite ``name`` from data directory ``d``."""
+    return sge.gfx.Sprite(name, sprite_dir(d, name), **kwargs)
 
-            for dirname in dirnames:
-                dp = os.path.join(nd, dirname)
-                if not os.path.exists(dp):
-                    os.makedirs(dp)
 
-            for fname in filenames:
-                shutil.copy2(os.path.join(dirpath, fname), nd)
-del dirs
+def load_compiled_map(fname):
+    """
+    Return the map data stored in the compiled version of Tiled map
+    ``fname`` (see compile_levels.py), or :const:`None` if there is no
+    compiled version or it is out of date.
+    """
+    try:
+        with open(data_path(os.path.splitext(fname)[0] + ".rtxl"), 'rb') as f:
+            buf = f.read()
+    except OSError:
+        return None
+
+    if buf[:4] != COMPILED_MAP_MAGIC:
+        return None
+    version, header_size = struct.unpack_from("<HI", buf, 4)
+    if version != COMPILED_MAP_VERSION:
+        return None
+
+    start = 4 + struct.calcsize("<HI")
+    header = json.loads(buf[start:start + header_size].decode("utf-8"))
+
+    # Compiled maps may be shipped without their sources, so a missing
+    # source is fine, but a changed one is not.
+    try:
+        with open(data_path(fname), 'rb') as f:
+            source = f.read()
+    except OSError:
+        pass
+    else:
+        if header["source"] != [len(source), zlib.crc32(source)]:
+            return None
+
+    tiles = array.array(TILE_TYPECODE)
+    tiles.frombytes(buf[start + header_size:])
+    if sys.byteorder == "big":
+        tiles.byteswap()
+
+    def unpack_layers(layers):
+        for layer in layers:
+            unpack_layers(layer.get("layers", []))
+            for part in [layer] + layer.get("chunks", []):
+                if "rtxl_data" in part:
+                    i, n = part.pop("rtxl_data")
+                    part["data"] = tiles[i:i + n]
+
+    tilemap = header["map"]
+    unpack_layers(tilemap.get("layers", []))
+    return tilemap
+
+
+def read_map(fname):
+    """
+    Read Tiled map ``fname`` (relative to the data directory) and
+    return its data with every tile layer decoded.  Tileset references
+    are resolved through the data overlay, so a map in the user data
+    directory can use tilesets from the main data directory and vice
+    versa.
+
+    A compiled version of the map is used instead of the JSON source
+    if it is up to date.
+
+    This only reads files and touches no shared state, so it is safe to
+    call from the preloading thread.
+    """
+    tilemap = load_compiled_map(fname)
+    if tilemap is None:
+        with open(data_path(fname), 'r') as f:
+            tilemap = json.load(f)
+
+    tmdir = os.path.dirname(os.path.normpath(fname))
+    for tileset in tilemap.get("tilesets", []):
+        if tileset.get("source"):
+            tileset["source"] = data_path(tmdir, tileset["source"])
+
+    def decode_layers(layers):
+        for layer in layers:
+            decode_layers(layer.get("layers", []))
+            if layer.get("type") == "tilelayer":
+                encoding = layer.get("encoding", "csv")
+                compression = layer.get("compression")
+                for part in [layer] + layer.get("chunks", []):
+                    data = part.get("data")
+                    if (data is not None
+                            and not isinstance(data, array.array)):
+                        part["data"] = decode_tiles(data, encoding,
+                                                    compression)
+
+    decode_layers(tilemap.get("layers", []))
+    return tilemap
+
+
+def load_map(fname, cls, tilemap=None):
+    """
+    Load Tiled map ``fname`` (relative to the data directory) as a room
+    of class ``cls``.  If ``tilemap`` is given, it is used as the data
+    of the map (as returned by :func:`read_map`) instead of reading the
+    map again.
+
+    This must be called from the main thread.
+    """
+    if tilemap is None:
+        tilemap = read_map(fname)
+
+    # The rest of this mirrors xsge_tiled.load from xSGE Tiled 2.0,
+    # except that tilesets are cached.  Keep it in step with that
+    # function when updating xSGE.
+    room_width = (tilemap.setdefault("width", 1)
+                  * tilemap.setdefault("tilewidth", 32))
+    room_height = (tilemap.setdefault("height", 1)
+                   * tilemap.setdefault("tileheight", 32))
+    tilemap.setdefault("renderorder", "right-down")
+    tilemap.setdefault("orientation", "orthogonal")
+    tilemap.setdefault("staggeraxis", "y")
+    tilemap.setdefault("staggerindex", "odd")
+    tilemap.setdefault("hexsidelength", 12)
+
+    if tilemap["orientation"] == "staggered":
+        if tilemap["staggeraxis"] == "x":
+            room_width = room_width / 2 + tilemap["tilewidth"] / 2
+        else:
+            room_height = room_height / 2 + tilemap["tileheight"] / 2
+    elif tilemap["orientation"] == "hexagonal":
+        if tilemap["staggeraxis"] == "x":
+            room_width = (room_width / 2 + tilemap["tilewidth"] / 2
+                          + tilemap["width"] * tilemap["hexsidelength"])
+        else:
+            room_height = (room_height / 2 + tilemap["tileheight"] / 2
+                           + tilemap["height"] * tilemap["hexsidelength"])
 
-gettext.install("retux", os.path.abspath(os.path.join(DATA, "locale")),
+    c = tilemap.get("backgroundcolor")
+    if c:
+        background = sge.gfx.Background([], xsge_tiled.t_get_color(c))
+    else:
+        background = None
+
+    # Tilesets are shared by most maps and loading their sprites takes
+    # most of the time needed to load a map, so they are only loaded
+    # once.
+    tmdir = os.path.dirname(data_path(fname))
+    tile_cls = {}
+    tile_sprites = {}
+    tile_kwargs = {}
+    tile_objectalignment = {}
+    for tileset in tilemap.get("tilesets", []):
+        key = (tileset.get("source"), tileset.get("firstgid", 1),
+               tilemap["tilewidth"], tilemap["tileheight"])
+        parsed = loaded_tilesets.get(key) if key[0] else None
+        if parsed is None:
+            parsed = xsge_tiled.t_get_tilesets(
+                {"tilesets": [tileset], "tilewidth": tilemap["tilewidth"],
+                 "tileheight": tilemap["tileheight"]}, tmdir, TYPES)
+            if key[0]:
+                loaded_tilesets[key] = parsed
+
+        tile_cls.update(parsed[0])
+        tile_sprites.update(parsed[1])
+        tile_kwargs.update(parsed[2])
+        tile_objectalignment.update(parsed[3])
+
+    objects = []
+    views = []
+    z = 0
+    for layer in tilemap.get("layers", []):
+        new_objects, new_views, z = xsge_tiled.t_parse_layer(
+            layer, tilemap, tmdir, tile_cls, tile_sprites, tile_kwargs,
+            tile_objectalignment, TYPES, z)
+        objects.extend(new_objects)
+        views.extend(new_views)
+
+    kwargs = {"objects": objects, "width": room_width, "height": room_height,
+              "views": views or None, "background": background}
+    kwargs.update(xsge_tiled.t_get_properties(tilemap.get("properties", [])))
+    return cls(**kwargs)
+
+
+def cached_sprite(key, sources, build, params=()):
+    """
+    Return the composited sprite ``key``.
+
+    If the sprite cache has an entry for ``key`` which was built from
+    the current versions of the data files listed in ``sources`` and
+    with the same ``params``, the sprite is loaded from its raw pixels
+    in the cache.  Otherwise, ``build`` is called to create the sprite
+    and the result is stored in the cache for the next launch.
+
+    ``params`` must list every value in the code that ``build`` depends
+    on, such as colors and blend modes, as JSON-compatible values.
+    Use :func:`code_stamp` for functions.
+    """
+    # Round trip the parameters through JSON so that they compare equal
+    # to the stored stamp (tuples become lists, for example).
+    stamp = [__version__, GOD, json.loads(json.dumps(list(params)))]
+    for rel in sources:
+        try:
+            st = os.stat(data_path(rel))
+        except OSError:
+            stamp.append([rel, None, None])
+        else:
+            stamp.append([rel, st.st_mtime_ns, st.st_size])
+
+    meta_fname = os.path.join(SPRITE_CACHE_DIR, "{}.json".format(key))
+    img_fname = os.path.join(SPRITE_CACHE_DIR, "{}.bmp".format(key))
+    try:
+        with open(meta_fname, 'r') as f:
+            meta = json.load(f)
+        if meta["stamp"] == stamp:
+            return sge.gfx.Sprite.from_tileset(
+                img_fname, columns=meta["frames"], width=meta["width"],
+                height=meta["height"], origin_x=meta["origin_x"],
+                origin_y=meta["origin_y"], transparent=meta["transparent"],
+                fps=meta["fps"], bbox_x=meta["bbox_x"],
+                bbox_y=meta["bbox_y"], bbox_width=meta["bbox_width"],
+                bbox_height=meta["bbox_height"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    sprite = build()
+    meta = {"stamp": stamp, "frames": sprite.frames, "width": sprite.width,
+            "height": sprite.height, "origin_x": sprite.origin_x,
+            "origin_y": sprite.origin_y, "transparent": sprite.transparent,
+            "fps": sprite.fps, "bbox_x": sprite.bbox_x,
+            "bbox_y": sprite.bbox_y, "bbox_width": sprite.bbox_width,
+            "bbox_height": sprite.bbox_height}
+    try:
+        os.makedirs(SPRITE_CACHE_DIR, exist_ok=True)
+        sprite.save(img_fname)
+        with open(meta_fname, 'w') as f:
+            json.dump(meta, f)
+    except (OSError, TypeError):
+        pass
+
+    return sprite
+
+
+def code_stamp(func):
+    """
+    Return a value which changes when the code of function ``func``
+    changes, for use in the ``params`` of :func:`cached_sprite`.
+    """
+    code = func.__code__
+    data = repr((code.co_names, code.co_varnames, code.co_consts)).encode()
+    return [code.co_name, zlib.crc32(code.co_code), zlib.crc32(data)]
+
+
+index_data()
+
+languages = [args.lang] if args.lang else None
+localedir = os.path.join(dirs[0], "locale")
+for d in reversed(dirs):
+    if gettext.find("retux", os.path.join(d, "locale"), languages):
+        localedir = os.path.join(d, "locale")
+        break
+
+gettext.install("retux", os.path.abspath(localedir),
                 names=["ngettext", "pgettext"])
 
 if args.lang:
-    lang = gettext.translation("retux",
-                               os.path.abspath(os.path.join(DATA, "locale")),
+    lang = gettext.translation("retux", os.path.abspath(localedir),
                                [args.lang])
     lang.install()
 
@@ -345,6 +703,14 @@ WIN_COUNT_POINTS_MAX = FPS
 WIN_COUNT_TIME_MAX = 5 * FPS
 WIN_FINISH_DELAY = 120
 
+INPUT_LEFT = 1 << 0
+INPUT_RIGHT = 1 << 1
+INPUT_UP = 1 << 2
+INPUT_DOWN = 1 << 3
+INPUT_JUMP = 1 << 4
+INPUT_ACTION = 1 << 5
+INPUT_SNEAK = 1 << 6
+
 MAP_SPEED = 4
 
 TEXT_SPEED = 1000
@@ -357,12 +723,30 @@ SOUND_ZERO_RADIUS = 1200
 SOUND_CENTERED_RADIUS = 150
 SOUND_TILTED_RADIUS = 1000
 SOUND_TILT_LIMIT = 0.75
+SOUND_CACHE_SIZE = 4 * 1024 * 1024
+TEXT_SPRITE_CACHE_SIZE = 64
+SCALED_SPRITE_CACHE_SIZE = 32
+GRAB_SPRITE_CACHE_SIZE = 4 * 1024 * 1024
+PROFILE_PHASES = ["activation", "lighting", "timeline", "player", "physics",
+                  "hud", "audio", "refresh"]
+PROFILE_FRAMES = FPS
+MAP_OBJECT_MEMORY = 1024
+MAP_RESERVE_MEMORY = 1024 * 1024
 
 text_outline_thickness = 0
 
 backgrounds = {}
+background_builders = {}
+background_refs = {}
 loaded_music = {}
+loaded_sounds = {}
+loaded_sounds_size = 0
+failed_sounds = set()
 tux_grab_sprites = {}
+tux_grab_sprites_size = 0
+text_sprites = {}
+scaled_sprites = {}
+profiler = None
 
 fullscreen = False
 scale_method = None
@@ -371,6 +755,7 @@ sound_volume = 1
 music_volume = 1
 stereo_enabled = True
 fps_enabled = False
+preload_memory = 64
 joystick_threshold = 0.5
 left_key = [["left", "a"]]
 right_key = [["right", "d"]]
@@ -401,12 +786,19 @@ worldmap = None
 loaded_worldmaps = {}
 levels = []
 loaded_levels = {}
+loaded_level_sizes = {}
+preloading_levels = {}
+preload_lock = threading.Lock()
+preload_queue = queue.Queue()
+preload_thread = None
 level_names = {}
 level_timers = {}
 cleared_levels = []
 tuxdolls_available = []
 tuxdolls_found = []
 watched_timelines = []
+loaded_timelines = {}
+timeline_code = {}
 level_time_bonus = 0
 current_worldmap = None
 worldmap_entry_space = None
@@ -423,11 +815,97 @@ mapdest = None
 mapdest_space = None
 
 
+class FrameProfiler:
+
+    """
+    Times the phases of each frame, which are named by
+    PROFILE_PHASES.  A phase's time includes the time of any phases
+    that happen inside of it.  The last PROFILE_FRAMES frames are
+    kept for the overlay shown by --profile; if ``fname`` is given,
+    every phase of every frame is written to ``fname`` as it ends, in
+    Chrome's trace event format, which chrome://tracing and Perfetto
+    can open.  :meth:`save` must be called to finish the file.
+    """
+
+    def __init__(self, fname=None):
+        self.fname = fname
+        self.start_time = time.perf_counter()
+        self.frame_start = None
+        self.frame_times = {}
+        self.stack = []
+        self.history = collections.deque(maxlen=PROFILE_FRAMES)
+        self.file = None
+        self.nevents = 0
+        if fname is not None:
+            self.file = open(fname, 'w')
+            self.file.write('{"traceEvents": [')
+
+    def begin_frame(self):
+        self.frame_start = time.perf_counter()
+        self.frame_times = {}
+
+    def end_frame(self):
+        if self.frame_start is None:
+            return
+
+        t = time.perf_counter() - self.frame_start
+        self.frame_times["frame"] = t
+        self.history.append(self.frame_times)
+        if self.file is not None:
+            self.write_event("frame", self.frame_start, t)
+        self.frame_start = None
+
+    def begin(self, phase):
+        self.stack.append((phase, time.perf_counter()))
+
+    def end(self):
+        phase, start = self.stack.pop()
+        t = time.perf_counter() - start
+        self.frame_times[phase] = self.frame_times.get(phase, 0) + t
+        if self.file is not None:
+            self.write_event(phase, start, t)
+
+    def get_averages(self):
+        """
+        Return a dictionary of how long each phase took in the last
+        PROFILE_FRAMES frames, on average, in milliseconds.
+        """
+        totals = {}
+        for times in self.history:
+            for phase in times:
+                totals[phase] = totals.get(phase, 0) + times[phase]
+
+        n = max(1, len(self.history))
+        return {phase: 1000 * totals[phase] / n for phase in totals}
+
+    def write_event(self, phase, start, t):
+        # Write a trace event for a phase to the file.
+        event = {
+            "name": phase, "cat": "frame" if phase == "frame" else "phase",
+            "ph": "X", "pid": 1, "tid": 1,
+            "ts": round((start - self.start_time) * 1000000, 3),
+            "dur": round(t * 1000000, 3)}
+        if self.nevents:
+            self.file.write(",")
+        self.file.write("\n")
+        json.dump(event, self.file)
+        self.nevents += 1
+
+    def save(self):
+        """Finish and close the file written to :attr:`fname`."""
+        if self.file is not None:
+            self.file.write('\n], "displayTimeUnit": "ms"}\n')
+            self.file.close()
+            self.file = None
+
+
 class Game(sge.dsp.Game):
 
     fps_time = 0
     fps_frames = 0
     fps_text = ""
+    profile_time = 0
+    profile_text = ""
 
     def show_hell(self):
         # Disabling this at least for now. It's just too inconsistent.
@@ -438,7 +916,37 @@ class Game(sge.dsp.Game):
                                    fill=sge.gfx.Color((255, 128, 128)),
                                    blend_mode=sge.BLEND_RGB_MULTIPLY)
 
+    def show_profile(self, time_passed):
+        self.profile_time += time_passed
+        if self.profile_time >= 250:
+            averages = profiler.get_averages()
+            lines = []
+            for phase in ["frame"] + PROFILE_PHASES:
+                lines.append("{}: {:.2f} ms".format(
+                    phase, averages.get(phase, 0)))
+            self.profile_text = "\n".join(lines)
+            self.profile_time = 0
+
+        self.project_text(font_small, self.profile_text, 8, self.height - 8,
+                          z=1000, color=sge.gfx.Color("yellow"),
+                          valign="bottom", outline=sge.gfx.Color("black"),
+                          outline_thickness=text_outline_thickness)
+
+    def refresh(self):
+        if profiler is None:
+            super().refresh()
+        else:
+            profiler.begin("refresh")
+            super().refresh()
+            profiler.end()
+            profiler.end_frame()
+
     def event_step(self, time_passed, delta_mult):
+        if profiler is not None:
+            profiler.begin_frame()
+            if PROFILE:
+                self.show_profile(time_passed)
+
         self.show_hell()
 
         if fps_enabled:
@@ -457,6 +965,11 @@ class Game(sge.dsp.Game):
                               outline_thickness=text_outline_thickness)
 
     def event_paused_step(self, time_passed, delta_mult):
+        if profiler is not None:
+            profiler.begin_frame()
+            if PROFILE:
+                self.show_profile(time_passed)
+
         self.show_hell()
 
     def event_close(self):
@@ -467,6 +980,333 @@ class Game(sge.dsp.Game):
         self.event_close()
 
 
+class HeadlessGame(Game):
+
+    """
+    Game used by --headless.  It runs frames back to back with a fixed
+    delta_mult and never draws anything.
+    """
+
+    frames = 0
+
+    def regulate_speed(self, fps=None):
+        return 1000 / self.fps
+
+    def refresh(self):
+        self.frames += 1
+        self.current_room.rd["projections"] = []
+        if profiler is not None:
+            profiler.end_frame()
+
+    def project_dot(self, *args, **kwargs):
+        pass
+
+    def project_line(self, *args, **kwargs):
+        pass
+
+    def project_rectangle(self, *args, **kwargs):
+        pass
+
+    def project_ellipse(self, *args, **kwargs):
+        pass
+
+    def project_circle(self, *args, **kwargs):
+        pass
+
+    def project_polyline(self, *args, **kwargs):
+        pass
+
+    def project_polygon(self, *args, **kwargs):
+        pass
+
+    def project_sprite(self, *args, **kwargs):
+        pass
+
+    def project_text(self, *args, **kwargs):
+        pass
+
+
+class ObjectIndex:
+
+    """
+    Index of the objects in a room which the activation sweep in
+    :meth:`Level.event_step` acts on.  Objects are sorted by what the
+    sweep does with them:
+
+    - ``"activate"``: interactive objects, which need activation checks
+      while they are inactive.
+    - ``"light"``: objects which project light.
+    - ``"animate"``: lava and goal decorations, whose animation is kept
+      in sync with the shared animation objects.
+
+    Lights and animated objects are kept in buckets which map grid
+    cells to the objects whose bounding boxes touch them.  Inactive
+    interactive objects are instead kept in a queue ordered by how far
+    the views have to move before the object could wake up, measured
+    along ``travel``, the total distance the views have moved.  An
+    object's ``wake_travel`` is the travel at which it is due, or
+    :const:`None` if it isn't queued.
+    """
+
+    def __init__(self, cell_size=TILE_SIZE * 8):
+        self.cell_size = cell_size
+        self.buckets = {"light": {}, "animate": {}}
+        self.cells = {}
+        self.travel = 0
+        self.view_rects = []
+        self.wake_queue = []
+        self.wake_counter = itertools.count()
+        self.nqueued = 0
+
+    def get_kinds(self, obj):
+        # Return the kinds of ``obj``.
+        kinds = []
+        if isinstance(obj, InteractiveObject):
+            kinds.append("activate")
+            if type(obj).project_light is not InteractiveObject.project_light:
+                kinds.append("light")
+        elif isinstance(obj, Player):
+            kinds.append("light")
+        elif isinstance(obj, (Lava, LavaSurface, Goal, GoalTop)):
+            kinds.append("animate")
+
+        return kinds
+
+    def get_cells(self, x, y, width, height):
+        # Return the range of grid cells touched by a rectangle as
+        # (left, top, right, bottom), inclusive.
+        cs = self.cell_size
+        return (math.floor(x / cs), math.floor(y / cs),
+                math.floor((x + width) / cs), math.floor((y + height) / cs))
+
+    def add(self, obj):
+        """Add ``obj`` to the index if the sweep needs it."""
+        kinds = self.get_kinds(obj)
+        if kinds and obj not in self.cells:
+            cells = self.get_cells(obj.bbox_left, obj.bbox_top,
+                                   obj.bbox_width, obj.bbox_height)
+            self.cells[obj] = (kinds, cells)
+            self._insert(obj, kinds, cells)
+            obj.object_index = self
+            if "activate" in kinds:
+                self.schedule(obj)
+
+    def remove(self, obj):
+        """Remove ``obj`` from the index."""
+        if obj in self.cells:
+            kinds, cells = self.cells.pop(obj)
+            self._discard(obj, kinds, cells)
+            if "activate" in kinds and obj.wake_travel is not None:
+                obj.wake_travel = None
+                self.nqueued -= 1
+                self._purge()
+            if obj.object_index is self:
+                obj.object_index = None
+
+    def update(self, obj):
+        """Move ``obj`` to the cells it touches now."""
+        if obj in self.cells:
+            kinds, old_cells = self.cells[obj]
+            cells = self.get_cells(obj.bbox_left, obj.bbox_top,
+                                   obj.bbox_width, obj.bbox_height)
+            if cells != old_cells:
+                self._discard(obj, kinds, old_cells)
+                self._insert(obj, kinds, cells)
+                self.cells[obj] = (kinds, cells)
+            if "activate" in kinds and not obj.active:
+                self.schedule(obj)
+
+    def schedule(self, obj, distance=0):
+        """
+        Have ``obj`` checked by the activation sweep once the views have
+        moved ``distance`` further, unless it is due for a check by then
+        already.
+        """
+        if obj in self.cells:
+            travel = self.travel + distance
+            if obj.wake_travel is None:
+                self.nqueued += 1
+            elif obj.wake_travel <= travel:
+                return
+
+            # Any entry the object already has is left in the queue and
+            # skipped when it comes up.
+            obj.wake_travel = travel
+            heapq.heappush(self.wake_queue,
+                           (travel, next(self.wake_counter), obj))
+            self._purge()
+
+    def move_views(self, views):
+        """
+        Add how far ``views`` have moved since the last call to
+        ``travel``.
+        """
+        rects = [(view.x, view.y, view.width, view.height) for view in views]
+        if len(rects) == len(self.view_rects):
+            distance = 0
+            for rect, old_rect in zip(rects, self.view_rects):
+                for a, b in zip(rect, old_rect):
+                    distance = max(distance, abs(a - b))
+            self.travel += distance
+        else:
+            for obj in self.cells:
+                if "activate" in self.cells[obj][0]:
+                    self.schedule(obj)
+
+        self.view_rects = rects
+
+    def pop_due(self):
+        """
+        Return a list of the objects which are due for an activation
+        check and take them off the queue.
+        """
+        due = {}
+        queue = self.wake_queue
+        while queue and queue[0][0] <= self.travel:
+            travel, i, obj = heapq.heappop(queue)
+            if travel == obj.wake_travel and obj in self.cells:
+                obj.wake_travel = None
+                self.nqueued -= 1
+                due[obj] = None
+
+        return list(due)
+
+    def _purge(self):
+        # Drop the stale entries from the queue once they outnumber the
+        # live ones, so removed objects aren't kept by the queue.
+        if len(self.wake_queue) > 2 * self.nqueued:
+            self.wake_queue = [
+                entry for entry in self.wake_queue
+                if entry[0] == entry[2].wake_travel and entry[2] in self.cells]
+            heapq.heapify(self.wake_queue)
+
+    def get(self, kind, x, y, width, height):
+        """
+        Return a set of the objects in bucket ``kind`` near a particular
+        area.  Like :meth:`sge.dsp.Room.get_objects_at`, this does not
+        ensure that the objects are actually within the area.
+        """
+        bucket = self.buckets[kind]
+        left, top, right, bottom = self.get_cells(x, y, width, height)
+        objects = set()
+        for i in range(left, right + 1):
+            for j in range(top, bottom + 1):
+                cell_objects = bucket.get((i, j))
+                if cell_objects:
+                    objects |= cell_objects
+
+        return objects
+
+    def _insert(self, obj, kinds, cells):
+        left, top, right, bottom = cells
+        for kind in kinds:
+            bucket = self.buckets.get(kind)
+            if bucket is None:
+                continue
+            for i in range(left, right + 1):
+                for j in range(top, bottom + 1):
+                    bucket.setdefault((i, j), set()).add(obj)
+
+    def _discard(self, obj, kinds, cells):
+        left, top, right, bottom = cells
+        for kind in kinds:
+            bucket = self.buckets.get(kind)
+            if bucket is None:
+                continue
+            for i in range(left, right + 1):
+                for j in range(top, bottom + 1):
+                    cell_objects = bucket.get((i, j))
+                    if cell_objects is not None:
+                        cell_objects.discard(obj)
+                        if not cell_objects:
+                            del bucket[(i, j)]
+
+
+class ClassIndex:
+
+    """
+    Index of the objects in a room by class, so that the objects of
+    one class can be found without looking at every object in the
+    room.  ``obj in index`` tells whether ``obj`` is in the index.
+    """
+
+    def __init__(self):
+        # Objects are kept by their exact type, and each class which has
+        # been looked up maps to the types which are subclasses of it.
+        self.types = {}
+        self.matches = {}
+
+    def __contains__(self, obj):
+        return obj in self.types.get(type(obj), ())
+
+    def add(self, obj):
+        """Add ``obj`` to the index."""
+        t = type(obj)
+        objects = self.types.get(t)
+        if objects is None:
+            objects = self.types[t] = {}
+            for cls, types in self.matches.items():
+                if issubclass(t, cls):
+                    types.append(t)
+
+        objects[obj] = None
+
+    def remove(self, obj):
+        """Remove ``obj`` from the index."""
+        objects = self.types.get(type(obj))
+        if objects is not None:
+            objects.pop(obj, None)
+
+    def get(self, cls):
+        """
+        Return a list of the objects which are instances of ``cls``,
+        which can be a class or a tuple of classes like the second
+        argument of :func:`isinstance`.
+        """
+        types = self.matches.get(cls)
+        if types is None:
+            types = [t for t in self.types if issubclass(t, cls)]
+            self.matches[cls] = types
+
+        objects = []
+        for t in types:
+            objects.extend(self.types[t])
+        return objects
+
+
+def indexed_property(name):
+    # Return a property which wraps property ``name`` of
+    # sge.dsp.Object and updates the object's ObjectIndex after it is
+    # set.
+    prop = getattr(sge.dsp.Object, name)
+
+    def fset(self, value):
+        prop.fset(self, value)
+        if self.object_index is not None:
+            self.object_index.update(self)
+
+    return property(prop.fget, fset)
+
+
+class IndexedObject(sge.dsp.Object):
+
+    """
+    Mixin for objects which can move and are kept in a room's
+    :class:`ObjectIndex`, keeping the index up to date as they move or
+    their bounding boxes change.  Changing an object's sprite doesn't
+    change its bounding box, so that needs no update.
+    """
+
+    object_index = None
+
+    x = indexed_property("x")
+    y = indexed_property("y")
+    bbox_x = indexed_property("bbox_x")
+    bbox_y = indexed_property("bbox_y")
+    bbox_width = indexed_property("bbox_width")
+    bbox_height = indexed_property("bbox_height")
+
+
 class Level(sge.dsp.Room):
 
     """Handles levels."""
@@ -490,6 +1330,11 @@ class Level(sge.dsp.Room):
         self.persistent = persistent
         self.points = 0
         self.timeline_objects = {}
+        self.object_index = ObjectIndex()
+        self.class_index = ClassIndex()
+        self.players = []
+        self.crash_lines = None
+        self.refreezing = {}
         self.warps = []
         self.shake_queue = 0
         self.pause_delay = TRANSITION_TIME
@@ -497,7 +1342,10 @@ class Level(sge.dsp.Room):
         self.status_text = None
 
         if bgname is not None:
-            background = backgrounds.get(bgname, background)
+            bg = acquire_background(bgname)
+            if bg is not None:
+                background = bg
+                weakref.finalize(self, release_background, bgname)
 
         self.load_timeline(timeline)
 
@@ -507,49 +1355,267 @@ class Level(sge.dsp.Room):
                 and self.ambient_light.blue >= 255):
             self.ambient_light = None
 
-        self.disable_lights = disable_lights or self.ambient_light is None
+        self.disable_lights = (disable_lights or self.ambient_light is None
+                               or HEADLESS)
 
         super().__init__(objects, background=background,
                          object_area_width=object_area_width,
                          object_area_height=object_area_height, **kwargs)
         self.add(gui_handler)
 
+    def add(self, obj):
+        super().add(obj)
+        self.object_index.add(obj)
+        self.class_index.add(obj)
+        if isinstance(obj, Player) and obj not in self.players:
+            self.players.append(obj)
+        elif isinstance(obj, CRASH_LINE_TYPES):
+            self.crash_lines = None
+
+    def remove(self, obj):
+        super().remove(obj)
+        self.object_index.remove(obj)
+        self.class_index.remove(obj)
+        self.refreezing.pop(obj, None)
+        if obj in self.players:
+            self.players.remove(obj)
+        elif isinstance(obj, CRASH_LINE_TYPES):
+            self.crash_lines = None
+
+    def nearest_player(self, x, y):
+        """
+        Return the player in the room nearest to position (``x``,
+        ``y``), or :const:`None` if there are no players.
+        """
+        player = None
+        dist = 0
+        for obj in self.players:
+            ndist = math.hypot(x - obj.x, y - obj.y)
+            if player is None or ndist < dist:
+                player = obj
+                dist = ndist
+        return player
+
+    def get_crash_y(self, left, right, y):
+        """
+        Return the height of the highest surface of the room's static
+        solids and slopes which is below ``y`` and between ``left`` and
+        ``right``, or the height of the room if there is none.
+        """
+        if self.crash_lines is None:
+            self.build_crash_lines()
+
+        crash_y = self.height
+        for i in range(math.floor(left / TILE_SIZE),
+                       math.ceil(right / TILE_SIZE)):
+            column = self.crash_lines.get(i)
+            if column is None:
+                continue
+
+            tops, objects = column
+            for j in range(bisect.bisect_right(tops, y), len(tops)):
+                if tops[j] >= crash_y:
+                    break
+                obj = objects[j]
+                if right > obj.bbox_left and left < obj.bbox_right:
+                    crash_y = min(crash_y, get_surface_y(obj, left, right))
+
+        return crash_y
+
+    def build_crash_lines(self):
+        # Sort the room's static solids and slopes into columns, each
+        # a pair of lists of the objects' tops and the objects
+        # themselves ordered by their tops.
+        columns = {}
+        for obj in self.class_index.get(CRASH_LINE_TYPES):
+            for i in range(math.floor(obj.bbox_left / TILE_SIZE),
+                           math.ceil(obj.bbox_right / TILE_SIZE)):
+                columns.setdefault(i, []).append(obj)
+
+        self.crash_lines = {}
+        for i, objects in columns.items():
+            objects.sort(key=lambda obj: obj.bbox_top)
+            self.crash_lines[i] = ([obj.bbox_top for obj in objects],
+                                   objects)
+
     def load_timeline(self, timeline):
         self.timeline = {}
+        self.timeline_keys = ()
         self.timeline_name = ""
         self.timeline_step = 0
+        self.timeline_cursor = 0
+        self.timeline_command = 0
+        self.timeline_loop = None
         self.timeline_skip_target = None
         if timeline:
             self.timeline_name = timeline
-            fname = os.path.join(DATA, "timelines", timeline)
-            with open(fname, 'r') as f:
-                jt = json.load(f)
-
-            for i in jt:
-                self.timeline[eval(i)] = jt[i]
+            self.timeline, self.timeline_keys = get_timeline(timeline)
 
     def add_timeline_object(self, obj):
         if obj.ID is not None:
             self.timeline_objects[obj.ID] = weakref.ref(obj)
 
     def timeline_skipto(self, step):
-        t_keys = sorted(self.timeline.keys())
         self.timeline_step = step
-        while t_keys and t_keys[0] < step:
-            i = t_keys.pop(0)
-            self.timeline[i] = []
+        cursor = bisect.bisect_left(self.timeline_keys, step)
+        if cursor > self.timeline_cursor:
+            self.timeline_cursor = cursor
+            self.timeline_command = 0
+            self.timeline_loop = None
+
+    def run_timeline(self):
+        # Run the timeline commands which are due.  The cursor
+        # (timeline_cursor, timeline_command) points at the next
+        # command to run, so steps which have already run are never
+        # looked at again.
+        keys = self.timeline_keys
+        while self.timeline_cursor < len(keys):
+            i = keys[self.timeline_cursor]
+            if i > self.timeline_step:
+                return
+
+            commands = self.timeline[i]
+            end_pass = False
+            while self.timeline_command < len(commands):
+                command, arg, args = commands[self.timeline_command]
+                self.timeline_command += 1
+
+                if command == "setattr":
+                    if args is not None:
+                        obj, name, value = args
+
+                        try:
+                            value = eval(get_timeline_code(value), globals(),
+                                         {"self": self})
+                        except Exception as e:
+                            m = _("An error occurred in a timeline "
+                                  "'setattr' command:\n\n{}").format(
+                                      traceback.format_exc())
+                            show_error(m)
+                        else:
+                            if obj in self.timeline_objects:
+                                obj = self.timeline_objects[obj]()
+                                if obj is not None:
+                                    setattr(obj, name, value)
+                            elif obj == "__level__":
+                                setattr(self, name, value)
+                elif command == "call":
+                    if args is not None:
+                        obj, method, fa = args
+                        fa = [eval(get_timeline_code(s), globals(),
+                                   {"self": self})
+                              for s in fa]
+
+                        if obj in self.timeline_objects:
+                            obj = self.timeline_objects[obj]()
+                            if obj is not None:
+                                getattr(obj, method, lambda: None)(*fa)
+                        elif obj == "__level__":
+                            getattr(self, method, lambda: None)(*fa)
+                elif command == "dialog":
+                    if args is not None:
+                        portrait, text = args
+                        sprite = portrait_sprites.get(portrait)
+                        DialogBox(gui_handler, _(text), sprite).show()
+                elif command == "play_music":
+                    self.music = arg
+                    play_music(arg)
+                elif command == "timeline":
+                    if self.timeline_name not in watched_timelines:
+                        watched_timelines.append(self.timeline_name)
+                    self.load_timeline(arg)
+                    return
+                elif command == "skip_to":
+                    if args is not None:
+                        self.timeline_skipto(args)
+                        break
+                elif command == "exec":
+                    try:
+                        exec(get_timeline_code(arg, "exec"), globals(),
+                             {"self": self})
+                    except Exception as e:
+                        m = _("An error occurred in a timeline 'exec' "
+                              "command:\n\n{}").format(traceback.format_exc())
+                        show_error(m)
+                elif command == "if":
+                    try:
+                        r = eval(get_timeline_code(arg), globals(),
+                                 {"self": self})
+                    except Exception as e:
+                        m = _("An error occurred in a timeline 'if' "
+                              "statement:\n\n{}").format(
+                                  traceback.format_exc())
+                        show_error(m)
+                        r = False
+                    if not r:
+                        end_pass = True
+                        break
+                elif command == "if_watched":
+                    if self.timeline_name not in watched_timelines:
+                        end_pass = True
+                        break
+                elif command == "if_not_watched":
+                    if self.timeline_name in watched_timelines:
+                        end_pass = True
+                        break
+                elif command == "while":
+                    try:
+                        r = eval(get_timeline_code(arg), globals(),
+                                 {"self": self})
+                    except Exception as e:
+                        m = _("An error occurred in a timeline "
+                              "'while' statement:\n\n{}").format(
+                                  traceback.format_exc())
+                        show_error(m)
+                        r = False
+                    if r:
+                        self.timeline_loop = self.timeline_command - 1
+                    else:
+                        self.timeline_loop = None
+                        end_pass = True
+                        break
+            else:
+                end_pass = True
+
+            if not end_pass:
+                # skip_to moved the cursor.
+                continue
+
+            if self.timeline_loop is not None:
+                # Run the loop again next frame, holding the timeline
+                # in place until the loop ends.
+                self.timeline_command = self.timeline_loop
+                self.timeline_step -= 1
+                return
+
+            self.timeline_cursor += 1
+            self.timeline_command = 0
+
+        if self.timeline_name and self.timeline_name not in watched_timelines:
+            watched_timelines.append(self.timeline_name)
+            self.timeline_name = ""
 
     def add_points(self, x):
         if main_area not in cleared_levels:
             self.points += x
 
     def show_hud(self):
+        if HEADLESS:
+            return
+
+        if profiler is not None:
+            profiler.begin("hud")
+
         # Show darkness
+        if profiler is not None:
+            profiler.begin("lighting")
         if self.ambient_light:
             xsge_lighting.project_darkness(ambient_light=self.ambient_light,
                                            buffer=TILE_SIZE * 2)
         else:
             xsge_lighting.clear_lights()
+        if profiler is not None:
+            profiler.end()
 
         if not NO_HUD:
             if self.points:
@@ -561,23 +1627,17 @@ class Level(sge.dsp.Room):
                 _("Score"), score_text,
                 _("Time Bonus") if time_bonus >= 0 else _("Time Penalty"),
                 abs(time_bonus))
-            sge.game.project_text(font, text, sge.game.width, 0,
-                                  color=sge.gfx.Color("white"), halign="right",
-                                  outline=sge.gfx.Color("black"),
-                                  outline_thickness=text_outline_thickness)
+            sprite = get_text_sprite(font, text, halign="right",
+                                     outline="black")
+            sge.game.project_sprite(sprite, 0, sge.game.width, 0)
 
             y = 0
             if self.name:
-                sge.game.project_text(
+                sprite = get_text_sprite(
                     font, pgettext("level_name", self.name),
-                    sge.game.width / 2, y, width=self.name_width,
-                    color=sge.gfx.Color("white"), halign="center",
-                    outline=sge.gfx.Color("black"),
-                    outline_thickness=text_outline_thickness)
-                y += font.get_height(
-                    pgettext("level_name", self.name),
-                    sge.game.width * 2 / 5,
-                    outline_thickness=text_outline_thickness)
+                    width=self.name_width, halign="center", outline="black")
+                sge.game.project_sprite(sprite, 0, sge.game.width / 2, y)
+                y += sprite.height
 
             if main_area in tuxdolls_available or main_area in tuxdolls_found:
                 if main_area in tuxdolls_found:
@@ -588,14 +1648,16 @@ class Level(sge.dsp.Room):
                                         s.height/2 + 8 + y)
 
             if self.status_text:
-                sge.game.project_text(font, self.status_text,
-                                      sge.game.width / 2, sge.game.height - 16,
-                                      color=sge.gfx.Color("white"),
-                                      halign="center", valign="middle",
-                                      outline=sge.gfx.Color("black"),
-                                      outline_thickness=text_outline_thickness)
+                sprite = get_text_sprite(font, self.status_text,
+                                         halign="center", valign="middle",
+                                         outline="black")
+                sge.game.project_sprite(sprite, 0, sge.game.width / 2,
+                                        sge.game.height - 16)
                 self.status_text = None
 
+        if profiler is not None:
+            profiler.end()
+
     def shake(self, num=1):
         shaking = (self.shake_queue or "shake_up" in self.alarms or
                    "shake_down" in self.alarms)
@@ -603,9 +1665,17 @@ class Level(sge.dsp.Room):
         if not shaking:
             self.event_alarm("shake_down")
 
-        for obj in self.objects:
-            if isinstance(obj, SteadyIcicle):
-                obj.check_shake(True)
+        for obj in self.class_index.get(SteadyIcicle):
+            obj.check_shake(True)
+
+    def has_tuxdoll(self):
+        # Return whether there is a Tux Doll to find in the room.
+        if self.class_index.get(TuxDoll):
+            return True
+        for obj in self.class_index.get((ItemBlock, HiddenItemBlock)):
+            if obj.item == "tuxdoll":
+                return True
+        return False
 
     def pause(self):
         global level_timers
@@ -674,29 +1744,34 @@ class Level(sge.dsp.Room):
                 if isinstance(obj, WinPuffObject) and obj.active:
                     obj.win_puff()
 
-            for obj in self.objects:
-                if isinstance(obj, Player):
-                    obj.human = False
-                    obj.left_pressed = False
-                    obj.right_pressed = False
-                    obj.up_pressed = False
-                    obj.down_pressed = False
-                    obj.jump_pressed = False
-                    obj.action_pressed = False
-                    obj.sneak_pressed = True
-                    obj.jump_release()
-
-                    if victory_walk:
-                        if obj.xvelocity >= 0:
-                            obj.right_pressed = True
-                        else:
-                            obj.left_pressed = True
+            for obj in self.players:
+                obj.human = False
+                obj.left_pressed = False
+                obj.right_pressed = False
+                obj.up_pressed = False
+                obj.down_pressed = False
+                obj.jump_pressed = False
+                obj.action_pressed = False
+                obj.sneak_pressed = True
+                obj.jump_release()
+
+                if victory_walk:
+                    if obj.xvelocity >= 0:
+                        obj.right_pressed = True
+                    else:
+                        obj.left_pressed = True
 
             if "timer" in self.alarms:
                 del self.alarms["timer"]
 
             self.won = True
             self.alarms["win_count_points"] = WIN_COUNT_START_TIME
+
+            # Load the next level while the score is being counted.
+            if (not current_worldmap and current_level is not None
+                    and current_level + 1 < len(levels)):
+                preload_level(levels[current_level + 1])
+
             current_checkpoints[main_area] = None
             sge.snd.Music.clear_queue()
             sge.snd.Music.stop()
@@ -750,28 +1825,24 @@ class Level(sge.dsp.Room):
             else:
                 level_timers[main_area] = 0
 
-        players = []
         spawn_point = None
 
-        for obj in self.objects:
-            if isinstance(obj, (Spawn, Door, WarpSpawn)):
-                if self.spawn is not None and obj.spawn_id == self.spawn:
-                    spawn_point = obj
+        for obj in self.class_index.get((Spawn, Door, WarpSpawn)):
+            if self.spawn is not None and obj.spawn_id == self.spawn:
+                spawn_point = obj
 
-                if isinstance(obj, Warp) and obj not in self.warps:
-                    self.warps.append(obj)
-            elif isinstance(obj, Player):
-                players.append(obj)
+            if isinstance(obj, Warp) and obj not in self.warps:
+                self.warps.append(obj)
 
         del_warps = []
         for warp in self.warps:
-            if warp not in self.objects:
+            if warp not in self.class_index:
                 del_warps.append(warp)
         for warp in del_warps:
             self.warps.remove(warp)
 
         if spawn_point is not None:
-            for player in players:
+            for player in self.players:
                 player.x = spawn_point.x
                 player.y = spawn_point.y
                 if player.view is not None:
@@ -807,156 +1878,56 @@ class Level(sge.dsp.Room):
         else:
             range_ = ACTIVATE_RANGE
 
-        for view in self.views:
-            for obj in self.get_objects_at(
-                    view.x - range_, view.y - range_, view.width + range_ * 2,
-                    view.height + range_ * 2):
-                if isinstance(obj, (Player, InteractiveObject)):
-                    if not self.disable_lights:
-                        obj.project_light()
+        if profiler is not None:
+            profiler.begin("activation")
+        self.object_index.move_views(self.views)
+        for obj in self.object_index.pop_due():
+            if not obj.active:
+                obj.update_active()
+                if not obj.active:
+                    self.object_index.schedule(obj, obj.get_wake_distance())
+        if profiler is not None:
+            profiler.end()
 
+        for view in self.views:
+            x = view.x - range_
+            y = view.y - range_
+            w = view.width + range_ * 2
+            h = view.height + range_ * 2
+
+            if not self.disable_lights:
+                if profiler is not None:
+                    profiler.begin("lighting")
+                for obj in self.object_index.get("light", x, y, w, h):
+                    obj.project_light()
+                if profiler is not None:
+                    profiler.end()
+
+            if profiler is not None:
+                profiler.begin("activation")
+            for obj in self.object_index.get("animate", x, y, w, h):
                 if not obj.active:
-                    if isinstance(obj, InteractiveObject):
-                        obj.update_active()
-                    elif isinstance(obj, (Lava, LavaSurface)):
+                    if isinstance(obj, (Lava, LavaSurface)):
                         obj.image_index = lava_animation.image_index
-                    elif isinstance(obj, (Goal, GoalTop)):
+                    else:
                         obj.image_index = goal_animation.image_index
+            if profiler is not None:
+                profiler.end()
+
+        # Refreeze thin ice
+        for obj in list(self.refreezing):
+            if not obj.refreeze(delta_mult):
+                del self.refreezing[obj]
 
         # Show HUD
         self.show_hud()
 
         # Timeline events
-        t_keys = sorted(self.timeline.keys())
-        while t_keys:
-            i = t_keys.pop(0)
-            if i <= self.timeline_step:
-                while i in self.timeline and self.timeline[i]:
-                    command = self.timeline[i].pop(0)
-                    command = command.split(None, 1)
-                    if command:
-                        if len(command) >= 2:
-                            command, arg = command[:2]
-                        else:
-                            command = command[0]
-                            arg = ""
-
-                        if command.startswith("#"):
-                            # Comment; do nothing
-                            pass
-                        elif command == "setattr":
-                            args = arg.split(None, 2)
-                            if len(args) >= 3:
-                                obj, name, value = args[:3]
-
-                                try:
-                                    value = eval(value)
-                                except Exception as e:
-                                    m = _("An error occurred in a timeline "
-                                          "'setattr' command:\n\n{}").format(
-                                              traceback.format_exc())
-                                    show_error(m)
-                                else:
-                                    if obj in self.timeline_objects:
-                                        obj = self.timeline_objects[obj]()
-                                        if obj is not None:
-                                            setattr(obj, name, value)
-                                    elif obj == "__level__":
-                                        setattr(self, name, value)
-                        elif command == "call":
-                            args = arg.split()
-                            if len(args) >= 2:
-                                obj, method = args[:2]
-                                fa = [eval(s) for s in args[2:]]
-
-                                if obj in self.timeline_objects:
-                                    obj = self.timeline_objects[obj]()
-                                    if obj is not None:
-                                        getattr(obj, method, lambda: None)(*fa)
-                                elif obj == "__level__":
-                                    getattr(self, method, lambda: None)(*fa)
-                        elif command == "dialog":
-                            args = arg.split(None, 1)
-                            if len(args) >= 2:
-                                portrait, text = args[:2]
-                                sprite = portrait_sprites.get(portrait)
-                                DialogBox(gui_handler, _(text), sprite).show()
-                        elif command == "play_music":
-                            self.music = arg
-                            play_music(arg)
-                        elif command == "timeline":
-                            if self.timeline_name not in watched_timelines:
-                                watched_timelines.append(self.timeline_name)
-                            self.load_timeline(arg)
-                            break
-                        elif command == "skip_to":
-                            try:
-                                arg = float(arg)
-                            except ValueError:
-                                pass
-                            else:
-                                self.timeline_skipto(arg)
-                                break
-                        elif command == "exec":
-                            try:
-                                exec(arg)
-                            except Exception as e:
-                                m = _("An error occurred in a timeline 'exec' "
-                                      "command:\n\n{}").format(
-                                          traceback.format_exc())
-                                show_error(m)
-                        elif command == "if":
-                            try:
-                                r = eval(arg)
-                            except Exception as e:
-                                m = _("An error occurred in a timeline 'if' "
-                                      "statement:\n\n{}").format(
-                                          traceback.format_exc())
-                                show_error(m)
-                                r = False
-                            finally:
-                                if not r:
-                                    self.timeline[i] = []
-                                    break
-                        elif command == "if_watched":
-                            if self.timeline_name not in watched_timelines:
-                                self.timeline[i] = []
-                                break
-                        elif command == "if_not_watched":
-                            if self.timeline_name in watched_timelines:
-                                self.timeline[i] = []
-                                break
-                        elif command == "while":
-                            try:
-                                r = eval(arg)
-                            except Exception as e:
-                                m = _("An error occurred in a timeline "
-                                      "'while' statement:\n\n{}").format(
-                                          traceback.format_exc())
-                                show_error(m)
-                                r = False
-                            finally:
-                                if r:
-                                    cur_timeline = self.timeline[i][:]
-                                    while_command = "while {}".format(arg)
-                                    self.timeline[i].insert(0, while_command)
-                                    t_keys.insert(0, i)
-                                    self.timeline[i - 1] = cur_timeline
-                                    self.timeline[i] = loop_timeline
-                                    i -= 1
-                                    self.timeline_step -= 1
-                                else:
-                                    self.timeline[i] = []
-                                    break
-                else:
-                    del self.timeline[i]
-            else:
-                break
-        else:
-            if (self.timeline_name and
-                    self.timeline_name not in watched_timelines):
-                watched_timelines.append(self.timeline_name)
-                self.timeline_name = ""
+        if profiler is not None:
+            profiler.begin("timeline")
+        self.run_timeline()
+        if profiler is not None:
+            profiler.end()
 
         self.timeline_step += delta_mult
 
@@ -1061,12 +2032,12 @@ class Level(sge.dsp.Room):
         else:
             range_ = ACTIVATE_RANGE
 
-        for view in self.views:
-            for obj in self.get_objects_at(
-                    view.x - range_, view.y - range_, view.width + range_ * 2,
-                    view.height + range_ * 2):
-                if isinstance(obj, InteractiveObject):
-                    if not self.disable_lights:
+        if not self.disable_lights:
+            for view in self.views:
+                for obj in self.object_index.get(
+                        "light", view.x - range_, view.y - range_,
+                        view.width + range_ * 2, view.height + range_ * 2):
+                    if isinstance(obj, InteractiveObject):
                         obj.project_light()
 
         self.show_hud()
@@ -1136,8 +2107,8 @@ class Level(sge.dsp.Room):
             if GOD:
                 self.alarms["win"] = WIN_FINISH_DELAY
             else:
-                for obj in self.objects:
-                    if isinstance(obj, Player) and obj.hp > 0:
+                for obj in self.players:
+                    if obj.hp > 0:
                         obj.hp -= 1
                         score += HP_POINTS
                         play_sound(heal_sound)
@@ -1151,12 +2122,17 @@ class Level(sge.dsp.Room):
         global level_names
         global tuxdolls_available
 
+        loading = preloading_levels.get(fname)
+        if loading is not None:
+            loading.wait()
+
+        with preload_lock:
+            tilemap = loaded_levels.pop(fname, None)
+            loaded_level_sizes.pop(fname, None)
         if fname in current_areas:
             r = current_areas[fname]
-        elif fname in loaded_levels:
-            r = loaded_levels.pop(fname)
         else:
-            if show_prompt:
+            if show_prompt and tilemap is None:
                 text = _("Loading level...")
                 if isinstance(sge.game.current_room, Worldmap):
                     sge.game.refresh()
@@ -1180,8 +2156,7 @@ class Level(sge.dsp.Room):
                     print(_("Loading \"{}\"...").format(fname))
 
             try:
-                r = xsge_tiled.load(
-                    os.path.join(DATA, "levels", fname), cls=cls, types=TYPES)
+                r = load_map(os.path.join("levels", fname), cls, tilemap)
             except Exception as e:
                 m = _("An error occurred when trying to load the level:\n\n"
                       "{}").format(traceback.format_exc())
@@ -1206,19 +2181,11 @@ class Level(sge.dsp.Room):
                     level_names[fname] = "???"
 
             if main_area in levels and main_area not in tuxdolls_available:
-                for obj in r.objects:
-                    if (isinstance(obj, TuxDoll) or
-                            (isinstance(obj, (ItemBlock, HiddenItemBlock)) and
-                             obj.item == "tuxdoll")):
-                        tuxdolls_available.append(main_area)
-                        break
+                if r.has_tuxdoll():
+                    tuxdolls_available.append(main_area)
             elif fname in levels and fname not in tuxdolls_available:
-                for obj in r.objects:
-                    if (isinstance(obj, TuxDoll) or
-                            (isinstance(obj, (ItemBlock, HiddenItemBlock)) and
-                             obj.item == "tuxdoll")):
-                        tuxdolls_available.append(fname)
-                        break
+                if r.has_tuxdoll():
+                    tuxdolls_available.append(fname)
 
         return r
 
@@ -1243,18 +2210,43 @@ class LevelRecorder(LevelTester):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.recording = {}
+        self.input_recording = {}
+        self.input_step = 0
+        self.last_input_step = 0
 
     def add_recording_event(self, command):
         self.recording.setdefault(self.timeline_step, []).append(command)
 
+    def record_input(self, step):
+        # Record the buttons each player is holding if they changed.
+        step = round(step)
+        for i in self.timeline_objects:
+            obj = self.timeline_objects[i]()
+            if isinstance(obj, Player) and obj.human:
+                inputs = self.input_recording.setdefault(i, [])
+                mask = obj.get_input_mask()
+                if mask != (inputs[-1][1] if inputs else 0):
+                    inputs.append((step, mask))
+
+    def event_step(self, time_passed, delta_mult):
+        # Players read their buttons after the room's step, so the
+        # buttons held now are the ones read during the last frame.
+        self.record_input(self.last_input_step)
+        super().event_step(time_passed, delta_mult)
+        self.last_input_step = self.input_step
+        self.input_step += delta_mult
+
     def event_key_press(self, key, char):
         if key == "f12":
             jt = self.recording
 
-            fname = "recording_{}.json".format(time.time())
-            with open(fname, 'w') as f:
+            fname = "recording_{}".format(time.time())
+            with open(fname + ".json", 'w') as f:
                 json.dump(jt, f, indent=4, sort_keys=True)
 
+            save_recording(fname + ".rtxr", self.fname, self.input_recording,
+                           round(self.input_step))
+
             sge.game.end()
 
         for i in self.timeline_objects:
@@ -1314,6 +2306,41 @@ class LevelRecorder(LevelTester):
                         "setattr {} sneak_pressed 0".format(obj.ID))
 
 
+class LevelReplayer(LevelTester):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replay = {}
+        self.replay_cursors = {}
+        self.replay_length = None
+        self.input_step = 0
+
+    def replay_input(self):
+        # Feed each recorded player the button changes which are due.
+        for i in self.replay:
+            obj = self.timeline_objects.get(i)
+            obj = obj() if obj is not None else None
+            if not isinstance(obj, Player):
+                continue
+
+            obj.human = False
+            inputs = self.replay[i]
+            cursor = self.replay_cursors.get(i, 0)
+            while (cursor < len(inputs)
+                   and inputs[cursor][0] <= self.input_step):
+                obj.set_input_mask(inputs[cursor][1])
+                cursor += 1
+            self.replay_cursors[i] = cursor
+
+    def event_step(self, time_passed, delta_mult):
+        self.replay_input()
+        super().event_step(time_passed, delta_mult)
+        self.input_step += delta_mult
+        if (self.replay_length is not None
+                and self.input_step >= self.replay_length):
+            sge.game.end()
+
+
 class SpecialScreen(Level):
 
     pass
@@ -1340,10 +2367,11 @@ class CreditsScreen(SpecialScreen):
         if self.fname in current_areas:
             del current_areas[self.fname]
 
-        if self.fname in loaded_levels:
-            del loaded_levels[self.fname]
+        with preload_lock:
+            loaded_levels.pop(self.fname, None)
+            loaded_level_sizes.pop(self.fname, None)
 
-        with open(os.path.join(DATA, "credits.json"), 'r') as f:
+        with open(data_path("credits.json"), 'r') as f:
             sections = json.load(f)
 
         logo_section = sge.dsp.Object.create(self.width / 2, self.height,
@@ -1432,9 +2460,18 @@ class Worldmap(sge.dsp.Room):
     def __init__(self, objects=(), *, object_area_width=TILE_SIZE * 2,
                  object_area_height=TILE_SIZE * 2, music=None, **kwargs):
         self.music = music
+        self.class_index = ClassIndex()
         super().__init__(objects, object_area_width=object_area_width,
                          object_area_height=object_area_height, **kwargs)
 
+    def add(self, obj):
+        super().add(obj)
+        self.class_index.add(obj)
+
+    def remove(self, obj):
+        super().remove(obj)
+        self.class_index.remove(obj)
+
     def show_menu(self):
         sge.snd.Music.pause()
         play_sound(pause_sound)
@@ -1454,16 +2491,18 @@ class Worldmap(sge.dsp.Room):
 
         main_area = None
 
-        for obj in self.objects:
-            if isinstance(obj, MapSpace):
-                obj.update_sprite()
+        for obj in self.class_index.get(MapSpace):
+            obj.update_sprite()
 
         play_music(self.music)
         level_cleared = False
 
     def event_step(self, time_passed, delta_mult):
         text = " {}/{}".format(len(tuxdolls_found), len(tuxdolls_available))
-        w = tuxdoll_sprite.width + font.get_width(text)
+        shadow = get_text_sprite(font, text, color="black", valign="middle",
+                                 outline="black")
+        sprite = get_text_sprite(font, text, valign="middle", outline="black")
+        w = tuxdoll_sprite.width + sprite.width - 2 * text_outline_thickness
 
         x = sge.game.width / 2 + tuxdoll_sprite.origin_x - w / 2
         y = tuxdoll_sprite.origin_y + 16
@@ -1471,26 +2510,18 @@ class Worldmap(sge.dsp.Room):
         sge.game.project_sprite(tuxdoll_sprite, 0, x, y)
 
         x += tuxdoll_sprite.width - tuxdoll_sprite.origin_x
-        sge.game.project_text(font, text, x + 2, y + 2,
-                              color=sge.gfx.Color("black"), halign="left",
-                              valign="middle", outline=sge.gfx.Color("black"),
-                              outline_thickness=text_outline_thickness)
-        sge.game.project_text(font, text, x, y, color=sge.gfx.Color("white"),
-                              halign="left", valign="middle",
-                              outline=sge.gfx.Color("black"),
-                              outline_thickness=text_outline_thickness)
+        sge.game.project_sprite(shadow, 0, x + 2, y + 2)
+        sge.game.project_sprite(sprite, 0, x, y)
 
         if self.level_text:
             x = sge.game.width / 2
             y = sge.game.height - font.size
-            sge.game.project_text(font, self.level_text, x + 2, y + 2,
-                                  color=sge.gfx.Color("black"),
-                                  halign="center", valign="bottom")
-            sge.game.project_text(font, self.level_text, x, y,
-                                  color=sge.gfx.Color("white"),
-                                  halign="center", valign="bottom",
-                                  outline=sge.gfx.Color("black"),
-                                  outline_thickness=text_outline_thickness)
+            shadow = get_text_sprite(font, self.level_text, color="black",
+                                     halign="center", valign="bottom")
+            sprite = get_text_sprite(font, self.level_text, halign="center",
+                                     valign="bottom", outline="black")
+            sge.game.project_sprite(shadow, 0, x + 2, y + 2)
+            sge.game.project_sprite(sprite, 0, x, y)
 
         if self.level_tuxdoll_available:
             x = sge.game.width / 2
@@ -1501,14 +2532,41 @@ class Worldmap(sge.dsp.Room):
             else:
                 sge.game.project_sprite(tuxdoll_transparent_sprite, 0, x, y)
 
+    def preload_levels(self, space):
+        """
+        Preload the level of ``space`` and the levels of the spaces
+        which can be reached from it, within ``preload_memory``.
+        """
+        wanted = []
+        if space.level:
+            wanted.append(space.level)
+
+        for path in space.get_exits():
+            if path is not None and path.points:
+                x, y = path.points[-1]
+                target = MapSpace.get_at(path.x + x, path.y + y)
+                if (target is not None and target.level
+                        and (space.cleared or target.cleared)):
+                    wanted.append(target.level)
+
+        needed = 0
+        for fname in wanted:
+            if (fname not in current_areas
+                    and fname not in loaded_level_sizes):
+                needed += MAP_RESERVE_MEMORY
+
+        used = trim_loaded_levels(wanted, needed)
+        limit = preload_memory * 1024 * 1024
+        for fname in wanted:
+            if used + MAP_RESERVE_MEMORY <= limit and preload_level(fname):
+                used += MAP_RESERVE_MEMORY
+
     @classmethod
     def load(cls, fname):
         if fname in loaded_worldmaps:
             return loaded_worldmaps.pop(fname)
         else:
-            return xsge_tiled.load(
-                os.path.join(DATA, "worldmaps", fname), cls=cls,
-                types=TYPES)
+            return load_map(os.path.join("worldmaps", fname), cls)
 
 
 class SolidLeft(xsge_physics.SolidLeft):
@@ -1666,7 +2724,7 @@ class LevelEnd(sge.dsp.Object):
         super().__init__(*args, **kwargs)
 
 
-class Player(xsge_physics.Collider):
+class Player(IndexedObject, xsge_physics.Collider):
 
     #/ "S.Penguin" is short for "Super-Penguin" (shortened for space).
     #/ Reference to the Super Saiyan form in Dragon Ball.
@@ -1719,6 +2777,7 @@ class Player(xsge_physics.Collider):
         self.view_is_barrier = view_is_barrier
 
         self.held_object = None
+        self.grab_sprite = None
         self.left_pressed = False
         self.right_pressed = False
         self.up_pressed = False
@@ -1765,6 +2824,50 @@ class Player(xsge_physics.Collider):
             self.action_pressed = states[5]
             self.sneak_pressed = states[6]
 
+    def get_input_mask(self):
+        """Return the buttons being pressed as a mask of INPUT_* bits."""
+        mask = 0
+        if self.left_pressed:
+            mask |= INPUT_LEFT
+        if self.right_pressed:
+            mask |= INPUT_RIGHT
+        if self.up_pressed:
+            mask |= INPUT_UP
+        if self.down_pressed:
+            mask |= INPUT_DOWN
+        if self.jump_pressed:
+            mask |= INPUT_JUMP
+        if self.action_pressed:
+            mask |= INPUT_ACTION
+        if self.sneak_pressed:
+            mask |= INPUT_SNEAK
+
+        return mask
+
+    def set_input_mask(self, mask):
+        """
+        Press the buttons in ``mask`` (a mask of INPUT_* bits) and
+        release the rest, as if the player had done so.
+        """
+        old_mask = self.get_input_mask()
+        self.left_pressed = int(bool(mask & INPUT_LEFT))
+        self.right_pressed = int(bool(mask & INPUT_RIGHT))
+        self.up_pressed = int(bool(mask & INPUT_UP))
+        self.down_pressed = int(bool(mask & INPUT_DOWN))
+        self.jump_pressed = int(bool(mask & INPUT_JUMP))
+        self.action_pressed = int(bool(mask & INPUT_ACTION))
+        self.sneak_pressed = int(bool(mask & INPUT_SNEAK))
+
+        pressed = mask & ~old_mask
+        if pressed & INPUT_UP:
+            self.press_up()
+        if pressed & INPUT_JUMP:
+            self.jump()
+        elif old_mask & ~mask & INPUT_JUMP:
+            self.jump_release()
+        if pressed & INPUT_ACTION:
+            self.action()
+
     def jump(self):
         if not self.warping and (self.on_floor or self.was_on_floor):
             for thin_ice in self.collision(ThinIce, y=(self.y + 1)):
@@ -1873,10 +2976,8 @@ class Player(xsge_physics.Collider):
         if not NO_HUD:
             y = 0
             w = (sge.game.width-sge.game.current_room.name_width)/2 - 8
-            name_sprite = sge.gfx.Sprite.from_text(
-                font, self.name, width=w,
-                color=sge.gfx.Color("white"), outline=sge.gfx.Color("black"),
-                outline_thickness=text_outline_thickness)
+            name_sprite = get_text_sprite(font, self.name, width=w,
+                                          outline="black")
             sge.game.project_sprite(name_sprite, 0, 0, y)
             y += name_sprite.height + font.size
 
@@ -1892,10 +2993,9 @@ class Player(xsge_physics.Collider):
 
             sge.game.project_sprite(coin_icon_sprite,
                                     coin_animation.image_index, 0, y)
-            sge.game.project_text(font, f"{self.coins}", 16, y,
-                                  color=sge.gfx.Color("white"),
-                                  outline=sge.gfx.Color("black"),
-                                  outline_thickness=text_outline_thickness)
+            coins_sprite = get_text_sprite(font, f"{self.coins}",
+                                           outline="black")
+            sge.game.project_sprite(coins_sprite, 0, 16, y)
 
             if not self.human:
                 room = sge.game.current_room
@@ -1914,11 +3014,10 @@ class Player(xsge_physics.Collider):
             obj_image_xscale = self.held_object.image_xscale
             obj_image_yscale = self.held_object.image_yscale
 
-            i = (body_sprite, obj_sprite, obj_image_index,
+            i = (body_sprite, arms_sprite, obj_sprite, obj_image_index,
                  obj_image_xscale, obj_image_yscale)
-            if i in tux_grab_sprites:
-                return tux_grab_sprites[i]
-            else:
+            grab = get_cached_grab_sprite(i)
+            if grab is None:
                 if abs(obj_image_xscale) != 1 or abs(obj_image_yscale) != 1:
                     obj_sprite = obj_sprite.copy()
                     obj_sprite.width *= abs(obj_image_xscale)
@@ -1942,39 +3041,34 @@ class Player(xsge_physics.Collider):
                     height -= top
                 height = max(height, top + obj_sprite.height)
 
-                grab_sprite = sge.gfx.Sprite(
-                    width=width, height=height, origin_x=origin_x,
-                    origin_y=origin_y)
-                for j in range(1, body_sprite.frames):
-                    grab_sprite.append_frame()
-                grab_sprite.draw_lock()
-                for j in range(grab_sprite.frames):
-                    x = origin_x + obj_sprite.origin_x
-                    y = (origin_y + self.carry_y + obj_sprite.origin_y -
-                         obj_sprite.height)
-                    grab_sprite.draw_sprite(obj_sprite, obj_image_index, x, y,
-                                            j)
-                    grab_sprite.draw_sprite(body_sprite, j, origin_x, origin_y,
-                                            j)
-                    grab_sprite.draw_sprite(arms_sprite, j, origin_x, origin_y,
-                                            j)
-                grab_sprite.draw_unlock()
-                tux_grab_sprites[i] = grab_sprite
-                return grab_sprite
+                x = origin_x + obj_sprite.origin_x
+                y = (origin_y + self.carry_y + obj_sprite.origin_y -
+                     obj_sprite.height)
+                grab = GrabSprite(
+                    width, height, origin_x, origin_y, body_sprite.frames,
+                    [(obj_sprite, obj_image_index, x, y),
+                     (body_sprite, None, origin_x, origin_y),
+                     (arms_sprite, None, origin_x, origin_y)])
+                cache_grab_sprite(i, grab)
         else:
-            i = id(body_sprite)
-            if i in tux_grab_sprites:
-                return tux_grab_sprites[i]
-            else:
-                grab_sprite = body_sprite.copy()
-                grab_sprite.draw_lock()
-                for j in range(grab_sprite.frames):
-                    grab_sprite.draw_sprite(arms_sprite, j,
-                                            grab_sprite.origin_x,
-                                            grab_sprite.origin_y, j)
-                grab_sprite.draw_unlock()
-                tux_grab_sprites[i] = grab_sprite
-                return grab_sprite
+            i = (body_sprite, arms_sprite)
+            grab = get_cached_grab_sprite(i)
+            if grab is None:
+                origin_x = body_sprite.origin_x
+                origin_y = body_sprite.origin_y
+                grab = GrabSprite(
+                    body_sprite.width, body_sprite.height, origin_x, origin_y,
+                    body_sprite.frames,
+                    [(body_sprite, None, origin_x, origin_y),
+                     (arms_sprite, None, origin_x, origin_y)],
+                    fps=body_sprite.fps)
+                cache_grab_sprite(i, grab)
+
+        # Only the frame about to be shown is drawn here; any other
+        # frames are drawn by event_end_step when they come up.
+        self.grab_sprite = grab
+        grab.draw_frame(self.image_index)
+        return grab.sprite
 
     def set_image(self):
         h_control = bool(self.right_pressed) - bool(self.left_pressed)
@@ -2082,6 +3176,9 @@ class Player(xsge_physics.Collider):
         self.view.y = self.y - self.view.height + CAMERA_TARGET_MARGIN_BOTTOM
 
     def event_update_position(self, delta_mult):
+        if profiler is not None:
+            profiler.begin("physics")
+
         super().event_update_position(delta_mult)
 
         held_object = self.held_object
@@ -2105,6 +3202,9 @@ class Player(xsge_physics.Collider):
             held_object.image_yscale = math.copysign(held_object.image_yscale,
                                                      self.image_yscale)
 
+        if profiler is not None:
+            profiler.end()
+
     def event_begin_step(self, time_passed, delta_mult):
         if not self.warping:
             self.refresh_input()
@@ -2160,6 +3260,9 @@ class Player(xsge_physics.Collider):
                                      / self.on_slope[0].bbox_width))
 
     def event_step(self, time_passed, delta_mult):
+        if profiler is not None:
+            profiler.begin("player")
+
         if self.warping:
             self.event_step_warp(time_passed, delta_mult)
         else:
@@ -2214,6 +3317,9 @@ class Player(xsge_physics.Collider):
 
         self.show_hud()
 
+        if profiler is not None:
+            profiler.end()
+
     def event_step_normal(self, time_passed, delta_mult):
         on_floor = self.get_bottom_touching_wall()
         self.on_slope = self.get_bottom_touching_slope() if not on_floor else []
@@ -2234,6 +3340,8 @@ class Player(xsge_physics.Collider):
         for block in self.on_floor:
             if block in self.was_on_floor and isinstance(block, HurtTop):
                 self.hurt()
+            elif isinstance(block, ThinIce):
+                block.step_on(delta_mult)
 
         # Set image
         if "fixed_sprite" not in self.alarms:
@@ -2284,6 +3392,17 @@ class Player(xsge_physics.Collider):
     def event_step_warp(self, time_passed, delta_mult):
         self.set_warp_image()
 
+    def event_end_step(self, time_passed, delta_mult):
+        super().event_end_step(time_passed, delta_mult)
+
+        # Make sure the frame of the grab sprite which is about to be
+        # shown has been drawn.
+        if self.grab_sprite is not None:
+            if self.sprite is self.grab_sprite.sprite:
+                self.grab_sprite.draw_frame(self.image_index)
+            else:
+                self.grab_sprite = None
+
     def event_paused_step(self, time_passed, delta_mult):
         self.show_hud()
 
@@ -2509,7 +3628,7 @@ class Smoke(sge.dsp.Object):
         self.destroy()
 
 
-class InteractiveObject(sge.dsp.Object):
+class InteractiveObject(IndexedObject):
 
     active_range = ENEMY_ACTIVE_RANGE
     killed_by_void = True
@@ -2524,6 +3643,7 @@ class InteractiveObject(sge.dsp.Object):
     activated = False
     parent = None
     warping = False
+    wake_travel = None
 
     def activate(self):
         self.activated = True
@@ -2531,6 +3651,8 @@ class InteractiveObject(sge.dsp.Object):
             self.tangible = True
         if not self.never_active:
             self.active = True
+        if self.object_index is not None:
+            self.object_index.schedule(self)
 
     def deactivate(self):
         self.activated = False
@@ -2538,6 +3660,28 @@ class InteractiveObject(sge.dsp.Object):
             self.active = False
         if not self.always_tangible:
             self.tangible = False
+        if self.object_index is not None:
+            self.object_index.schedule(self)
+
+    def get_wake_distance(self):
+        # Return how far the views can move before update_active could
+        # change whether the object is activated.
+        if self.warping:
+            return 0
+
+        distance = math.inf
+        for view in sge.game.current_room.views:
+            # The object is in range of the view if none of these are
+            # positive, and the largest of them is how far the view has
+            # to move to change that.
+            gap = max(
+                self.bbox_left - (view.x + view.width + self.active_range),
+                view.x - self.active_range - self.bbox_right,
+                self.bbox_top - (view.y + view.height + self.active_range),
+                view.y - self.active_range - self.bbox_bottom)
+            distance = min(distance, abs(gap))
+
+        return distance
 
     def update_active(self):
         if not self.warping:
@@ -2559,15 +3703,7 @@ class InteractiveObject(sge.dsp.Object):
                 self.destroy()
 
     def get_nearest_player(self):
-        player = None
-        dist = 0
-        for obj in sge.game.current_room.objects:
-            if isinstance(obj, Player):
-                ndist = math.hypot(self.x - obj.x, self.y - obj.y)
-                if player is None or ndist < dist:
-                    player = obj
-                    dist = ndist
-        return player
+        return sge.game.current_room.nearest_player(self.x, self.y)
 
     def set_direction(self, direction):
         self.image_xscale = abs(self.image_xscale) * direction
@@ -2640,6 +3776,13 @@ class InteractiveObject(sge.dsp.Object):
 
 class InteractiveCollider(InteractiveObject, xsge_physics.Collider):
 
+    def event_update_position(self, delta_mult):
+        if profiler is not None:
+            profiler.begin("physics")
+        super().event_update_position(delta_mult)
+        if profiler is not None:
+            profiler.end()
+
     def deactivate(self):
         tangible_anyway = False
         if not self.never_tangible:
@@ -3681,36 +4824,43 @@ class Icicle(InteractiveObject):
 
     def check_shake(self):
         if not self.warping:
-            players = []
-            crash_y = sge.game.current_room.height
-            objects = (
-                sge.game.current_room.get_objects_at(
-                    self.bbox_left - ICICLE_LAX, self.bbox_bottom,
-                    self.bbox_width + 2*ICICLE_LAX,
-                    (sge.game.current_room.height-self.bbox_bottom
-                     + sge.game.current_room.object_area_height))
-                | sge.game.current_room.object_area_void)
-            for obj in objects:
-                if (obj.bbox_top > self.bbox_bottom
-                        and self.bbox_right > obj.bbox_left
-                        and self.bbox_left < obj.bbox_right):
-                    if isinstance(obj, xsge_physics.SolidTop):
-                        crash_y = min(crash_y, obj.bbox_top)
-                    elif isinstance(obj, xsge_physics.SlopeTopLeft):
-                        crash_y = min(crash_y, obj.get_slope_y(self.bbox_right))
-                    elif isinstance(obj, xsge_physics.SlopeTopRight):
-                        crash_y = min(crash_y, obj.get_slope_y(self.bbox_left))
-                if (obj.bbox_bottom > self.bbox_top
-                        and self.bbox_right + ICICLE_LAX > obj.bbox_left
-                        and self.bbox_left - ICICLE_LAX < obj.bbox_right):
-                    if isinstance(obj, Player):
-                        players.append(obj)
-
-            for player in players:
-                if player.bbox_top < crash_y:
+            room = sge.game.current_room
+            crash_y = room.get_crash_y(self.bbox_left, self.bbox_right,
+                                       self.bbox_bottom)
+            for player in room.players:
+                if (player.bbox_bottom > self.bbox_top
+                        and self.bbox_right + ICICLE_LAX > player.bbox_left
+                        and self.bbox_left - ICICLE_LAX < player.bbox_right
+                        and player.bbox_top < crash_y
+                        and player.bbox_top < self.get_crash_y(
+                            player.bbox_top)):
                     self.do_shake()
                     break
 
+    def get_crash_y(self, bottom):
+        # Return the highest surface of the solids and slopes below the
+        # icicle which aren't static, looking no further down than
+        # ``bottom``, or the height of the room if there is none.
+        # Static ones are found by Level.get_crash_y.
+        room = sge.game.current_room
+        crash_y = room.height
+        if bottom <= self.bbox_bottom:
+            return crash_y
+
+        objects = (room.get_objects_at(self.bbox_left, self.bbox_bottom,
+                                       self.bbox_width,
+                                       bottom - self.bbox_bottom)
+                   | room.object_area_void)
+        for obj in objects:
+            if (obj.bbox_top > self.bbox_bottom
+                    and self.bbox_right > obj.bbox_left
+                    and self.bbox_left < obj.bbox_right
+                    and not isinstance(obj, CRASH_LINE_TYPES)):
+                crash_y = min(crash_y, get_surface_y(obj, self.bbox_left,
+                                                     self.bbox_right))
+
+        return crash_y
+
     def deactivate(self):
         self.shaking = False
         super().deactivate()
@@ -3977,8 +5127,8 @@ class Boss(InteractiveObject):
         sge.game.current_room.add_timeline_object(self)
 
     def event_destroy(self):
-        for obj in sge.game.current_room.objects:
-            if obj is not self and isinstance(obj, Boss) and obj.stage > 0:
+        for obj in sge.game.current_room.class_index.get(Boss):
+            if obj is not self and obj.stage > 0:
                 break
         else:
             if self.death_timeline:
@@ -5369,14 +6519,24 @@ class InfoBlock(HittableBlock, xsge_physics.Solid):
 
 class ThinIce(xsge_physics.Solid):
 
+    """
+    Ice which cracks while players stand on it and slowly refreezes
+    when they leave.  Thin ice has no step event of its own: players
+    call :meth:`step_on` for the ice they are standing on, and the
+    level calls :meth:`refreeze` each frame for ice which is cracked.
+    Until it shatters, thin ice is inactive.
+    """
+
     def __init__(self, x, y, z=0, permanent=False, **kwargs):
         kwargs["sprite"] = thin_ice_sprite
         kwargs["checks_collisions"] = False
         kwargs["image_fps"] = 0
+        kwargs["active"] = False
         sge.dsp.Object.__init__(self, x, y, z, **kwargs)
         self.permanent = permanent
         self.crack_time = 0
         self.freeze_time = 0
+        self.stood_on = False
 
     def burn(self):
         self.crack()
@@ -5385,29 +6545,47 @@ class ThinIce(xsge_physics.Solid):
         if self.image_index > 0:
             self.image_index -= 1
 
-    def event_step(self, time_passed, delta_mult):
+    def step_on(self, delta_mult):
+        # Crack the ice for one frame of a player standing on it.
         if self.sprite is thin_ice_sprite:
-            players = self.collision(Player, y=(self.y - 1))
-            if players:
-                for player in players:
-                    self.crack_time += delta_mult
-                    while self.crack_time >= ICE_CRACK_TIME:
-                        self.crack_time -= ICE_CRACK_TIME
-                        self.crack()
-            elif not self.permanent:
+            self.stood_on = True
+            self.crack_time += delta_mult
+            while self.crack_time >= ICE_CRACK_TIME:
+                self.crack_time -= ICE_CRACK_TIME
+                self.crack()
+            self.start_refreezing()
+
+    def start_refreezing(self):
+        # Have the level refreeze the ice each frame until it's whole.
+        if not self.permanent:
+            sge.game.current_room.refreezing[self] = None
+
+    def refreeze(self, delta_mult):
+        """
+        Refreeze the ice for one frame, unless a player stood on it
+        during the last one.  Return whether the ice still needs to
+        refreeze.
+        """
+        if self.sprite is not thin_ice_sprite:
+            return False
+
+        if self.stood_on:
+            self.stood_on = False
+        elif self.image_index > 0:
+            rfa = delta_mult * ICE_REFREEZE_RATE
+            self.crack_time -= rfa
+            self.rfa = max(0, -self.crack_time)
+            self.crack_time = max(0, self.crack_time)
+            self.freeze_time += rfa
+            while self.freeze_time >= ICE_CRACK_TIME:
+                self.freeze_time -= ICE_CRACK_TIME
                 if self.image_index > 0:
-                    rfa = delta_mult * ICE_REFREEZE_RATE
-                    self.crack_time -= rfa
-                    self.rfa = max(0, -self.crack_time)
-                    self.crack_time = max(0, self.crack_time)
-                    self.freeze_time += rfa
-                    while self.freeze_time >= ICE_CRACK_TIME:
-                        self.freeze_time -= ICE_CRACK_TIME
-                        if self.image_index > 0:
-                            self.image_index -= 1
-                else:
-                    self.crack_time -= delta_mult * ICE_REFREEZE_RATE
-                    self.crack_time = max(0, self.crack_time)
+                    self.image_index -= 1
+        else:
+            self.crack_time -= delta_mult * ICE_REFREEZE_RATE
+            self.crack_time = max(0, self.crack_time)
+
+        return self.stood_on or self.image_index > 0 or self.crack_time > 0
 
     def event_animation_end(self):
         self.destroy()
@@ -5417,6 +6595,7 @@ class ThinIce(xsge_physics.Solid):
             self.sprite = thin_ice_break_sprite
             self.image_index = 0
             self.image_fps = None
+            self.active = True
             play_sound(ice_shatter_sound, self.x, self.y)
 
     def crack(self):
@@ -5424,6 +6603,7 @@ class ThinIce(xsge_physics.Solid):
             play_sound(random.choice(ice_crack_sounds), self.x, self.y)
             self.image_index += 1
             self.freeze_time = 0
+            self.start_refreezing()
         else:
             self.shatter()
 
@@ -5564,6 +6744,8 @@ class Door(sge.dsp.Object):
         self.dest = dest
         self.spawn_id = spawn_id
         self.occupant = None
+        self.occupant_sprite = None
+        self.back_sprite = None
 
     def warp(self, other):
         if self.occupant is None and self.image_index == 0:
@@ -5586,17 +6768,24 @@ class Door(sge.dsp.Object):
 
     def event_step(self, time_passed, delta_mult):
         if self.occupant is not None:
-            s = get_scaled_copy(self.occupant)
+            s = get_scaled_sprite(self.occupant, 0)
             if self.image_fps > 0:
                 sge.game.current_room.project_sprite(
                     door_back_sprite, 0, self.x, self.y, self.z - 0.5)
                 sge.game.current_room.project_sprite(s, 0, self.x, self.y,
                                                      self.occupant.z)
             else:
-                dbs = door_back_sprite.copy()
-                dbs.draw_sprite(s, 0, dbs.origin_x, dbs.origin_y)
-                sge.game.current_room.project_sprite(dbs, 0, self.x, self.y,
-                                                     self.z - 0.5)
+                # The occupant is drawn onto the back of the door so the
+                # door frame hides the parts outside of it.  That only
+                # needs to be done again if the occupant's image changes.
+                if self.occupant_sprite is not s:
+                    self.occupant_sprite = s
+                    self.back_sprite = door_back_sprite.copy()
+                    self.back_sprite.draw_sprite(
+                        s, 0, self.back_sprite.origin_x,
+                        self.back_sprite.origin_y)
+                sge.game.current_room.project_sprite(
+                    self.back_sprite, 0, self.x, self.y, self.z - 0.5)
         elif self.image_index != 0:
             sge.game.current_room.project_sprite(door_back_sprite, 0, self.x,
                                                  self.y, self.z - 0.5)
@@ -5674,43 +6863,28 @@ class WarpSpawn(xsge_path.Path):
                     obj.bbox_right = x
                     finished.append(obj)
                 else:
-                    warp_sprite = get_scaled_copy(obj)
-                    warp_sprite.draw_erase(
-                        math.ceil(x - left_edge), 0, warp_sprite.width,
-                        warp_sprite.height)
-                    sge.game.current_room.project_sprite(
-                        warp_sprite, obj.image_index, obj.x, obj.y, self.z)
+                    project_clipped(obj, self.z,
+                                    right=math.ceil(x - left_edge))
             elif self.end_direction == "right":
                 if obj.bbox_left >= x:
                     obj.bbox_left = x
                     finished.append(obj)
                 else:
-                    warp_sprite = get_scaled_copy(obj)
-                    warp_sprite.draw_erase(0, 0, math.floor(x - left_edge),
-                                           warp_sprite.height)
-                    sge.game.current_room.project_sprite(
-                        warp_sprite, obj.image_index, obj.x, obj.y, self.z)
+                    project_clipped(obj, self.z,
+                                    left=math.floor(x - left_edge))
             elif self.end_direction == "up":
                 if obj.bbox_bottom <= y:
                     obj.bbox_bottom = y
                     finished.append(obj)
                 else:
-                    warp_sprite = get_scaled_copy(obj)
-                    warp_sprite.draw_erase(
-                        0, math.ceil(y - top_edge), warp_sprite.width,
-                        warp_sprite.height)
-                    sge.game.current_room.project_sprite(
-                        warp_sprite, obj.image_index, obj.x, obj.y, self.z)
+                    project_clipped(obj, self.z,
+                                    bottom=math.ceil(y - top_edge))
             elif self.end_direction == "down":
                 if obj.bbox_top >= y:
                     obj.bbox_top = y
                     finished.append(obj)
                 else:
-                    warp_sprite = get_scaled_copy(obj)
-                    warp_sprite.draw_erase(0, 0, warp_sprite.width,
-                                           math.floor(y - top_edge))
-                    sge.game.current_room.project_sprite(
-                        warp_sprite, obj.image_index, obj.x, obj.y, self.z)
+                    project_clipped(obj, self.z, top=math.floor(y - top_edge))
 
         for obj in finished:
             obj.visible = True
@@ -5798,41 +6972,26 @@ class Warp(WarpSpawn):
                 if obj.x <= self.x + obj.image_origin_x - obj.sprite.width:
                     finished.append(obj)
                 else:
-                    warp_sprite = get_scaled_copy(obj)
-                    warp_sprite.draw_erase(
-                        0, 0, math.floor(self.x - left_edge),
-                        warp_sprite.height)
-                    sge.game.current_room.project_sprite(
-                        warp_sprite, obj.image_index, obj.x, obj.y, self.z)
+                    project_clipped(obj, self.z,
+                                    left=math.floor(self.x - left_edge))
             elif self.direction == "right":
                 if obj.x >= self.x + obj.image_origin_x:
                     finished.append(obj)
                 else:
-                    warp_sprite = get_scaled_copy(obj)
-                    warp_sprite.draw_erase(
-                        math.ceil(self.x - left_edge), 0, warp_sprite.width,
-                        warp_sprite.height)
-                    sge.game.current_room.project_sprite(
-                        warp_sprite, obj.image_index, obj.x, obj.y, self.z)
+                    project_clipped(obj, self.z,
+                                    right=math.ceil(self.x - left_edge))
             elif self.direction == "up":
                 if obj.y <= self.y + obj.image_origin_y - obj.sprite.height:
                     finished.append(obj)
                 else:
-                    warp_sprite = get_scaled_copy(obj)
-                    warp_sprite.draw_erase(0, 0, warp_sprite.width,
-                                           math.floor(self.y - top_edge))
-                    sge.game.current_room.project_sprite(
-                        warp_sprite, obj.image_index, obj.x, obj.y, self.z)
+                    project_clipped(obj, self.z,
+                                    top=math.floor(self.y - top_edge))
             elif self.direction == "down":
                 if obj.y >= self.y + obj.image_origin_y:
                     finished.append(obj)
                 else:
-                    warp_sprite = get_scaled_copy(obj)
-                    warp_sprite.draw_erase(
-                        0, math.ceil(self.y - top_edge), warp_sprite.width,
-                        warp_sprite.height)
-                    sge.game.current_room.project_sprite(
-                        warp_sprite, obj.image_index, obj.x, obj.y, self.z)
+                    project_clipped(obj, self.z,
+                                    bottom=math.ceil(self.y - top_edge))
 
         for obj in finished:
             obj.x = self.x
@@ -5919,9 +7078,8 @@ class MovingObjectPath(xsge_path.PathLink):
 
     def event_create(self):
         if self.parent is not None:
-            for obj in sge.game.current_room.objects:
-                if (isinstance(obj, self.__class__) and
-                        obj.path_id == self.parent):
+            for obj in sge.game.current_room.class_index.get(self.__class__):
+                if obj.path_id == self.parent:
                     obj.next_path = self
                     obj.next_speed = self.path_speed
                     obj.next_accel = self.path_accel
@@ -6009,6 +7167,7 @@ class CircoflamePath(xsge_path.Path):
 class MapPlayer(sge.dsp.Object):
 
     moving = False
+    preload_space = None
 
     def _follow_path(self, space, path):
         if path is not None and not self.moving:
@@ -6022,6 +7181,7 @@ class MapPlayer(sge.dsp.Object):
                 if space.cleared or target_space.cleared:
                     self.moving = True
                     path.follow_start(self, MAP_SPEED)
+                    sge.game.current_room.preload_levels(target_space)
             else:
                 print("Space at position ({}, {}) doesn't exist!".format(
                     path.x + x, path.y + y))
@@ -6077,9 +7237,8 @@ class MapPlayer(sge.dsp.Object):
             worldmap_entry_space = start_space.ID
 
         if current_worldmap_space is not None:
-            for obj in sge.game.current_room.objects:
-                if (isinstance(obj, MapSpace) and
-                        obj.ID == current_worldmap_space):
+            for obj in sge.game.current_room.class_index.get(MapSpace):
+                if obj.ID == current_worldmap_space:
                     self.x = obj.x
                     self.y = obj.y
 
@@ -6097,8 +7256,12 @@ class MapPlayer(sge.dsp.Object):
         self.image_fps = self.sprite.fps
 
         if space is not None:
+            if space is not self.preload_space:
+                self.preload_space = space
+                room.preload_levels(space)
+
             if space.level and space.level not in level_names:
-                fname = os.path.join(DATA, "levels", space.level)
+                fname = data_path("levels", space.level)
                 try:
                     with open(fname) as f:
                         data = json.load(f)
@@ -6545,7 +7708,7 @@ class NewGameMenu(Menu):
             elif slot.get("levelset") is None:
                 cls.items.append(_("-No Levelset-"))
             else:
-                fname = os.path.join(DATA, "levelsets", slot["levelset"])
+                fname = data_path("levelsets", slot["levelset"])
                 try:
                     with open(fname, 'r') as f:
                         data = json.load(f)
@@ -6639,9 +7802,9 @@ class LevelsetMenu(Menu):
     def create_page(cls, default=0, page=0, refreshlist=False):
         if refreshlist or not cls.levelsets:
             cls.levelsets = []
-            for fname in os.listdir(os.path.join(DATA, "levelsets")):
+            for fname in data_listdir("levelsets"):
                 try:
-                    with open(os.path.join(DATA, "levelsets", fname), 'r') as f:
+                    with open(data_path("levelsets", fname), 'r') as f:
                         data = json.load(f)
                 except (OSError, ValueError):
                     continue
@@ -6860,7 +8023,6 @@ class OptionsMenu(Menu):
                             infolist = rtz.infolist()
                             for i in range(len(infolist)):
                                 member = infolist[i]
-                                rtz.extract(member, DATA)
                                 rtz.extract(member, os.path.join(LOCAL, "data"))
                                 progressbar.progress = (i + 1) / len(infolist)
                                 progressbar.redraw()
@@ -6870,6 +8032,7 @@ class OptionsMenu(Menu):
                     except Exception as e:
                         show_error(str(e))
 
+                    index_data()
                     window.destroy()
                     sge.game.pump_input()
                     gui_handler.event_step(0, 0)
@@ -7193,7 +8356,7 @@ class PauseMenu(ModalMenu):
 
     @classmethod
     def create(cls, default=0):
-        if LEVEL or RECORD:
+        if LEVEL or RECORD or REPLAY:
             items = [_("Continue"), _("Configure keyboard"),
                      _("Configure joysticks"), _("Abort")]
         elif current_worldmap:
@@ -7341,6 +8504,12 @@ class DialogBox(xsge_gui.Dialog):
         else:
             self.destroy()
 
+    def show(self):
+        # Dialog boxes wait for the player to dismiss them, which can't
+        # happen in headless mode.
+        if not HEADLESS:
+            super().show()
+
     def event_press_escape(self):
         self.destroy()
         room = sge.game.current_room
@@ -7350,35 +8519,162 @@ class DialogBox(xsge_gui.Dialog):
             room.timeline_skipto(room.timeline_skip_target)
 
 
+class LazySound:
+
+    """
+    Stand-in for a :class:`sge.snd.Sound` which is only decoded the
+    first time it is played.  Decoded sounds are kept in
+    ``loaded_sounds`` and evicted, least recently played first, when
+    their total size exceeds :const:`SOUND_CACHE_SIZE`.
+    """
+
+    @property
+    def playing(self):
+        sound = loaded_sounds.get(self)
+        return sound.playing if sound is not None else 0
+
+    def __init__(self, fname, parent=None):
+        self.fname = fname
+        self.parent = parent
+        self.size = 0
+
+    def play(self, *args, **kwargs):
+        sound = get_sound(self)
+        if sound is not None:
+            sound.play(*args, **kwargs)
+
+    def stop(self, *args, **kwargs):
+        sound = loaded_sounds.get(self)
+        if sound is not None:
+            sound.stop(*args, **kwargs)
+
+
+class GrabSprite:
+
+    """
+    Sprite of Tux with his arms out, possibly holding something, whose
+    frames are only drawn the first time they are shown.  ``layers`` is
+    a list of ``(sprite, image, x, y)`` tuples to draw onto each frame,
+    bottom first; an ``image`` of :const:`None` means the frame being
+    drawn.
+    """
+
+    def __init__(self, width, height, origin_x, origin_y, frames, layers,
+                 fps=60):
+        self.sprite = sge.gfx.Sprite(width=width, height=height,
+                                     origin_x=origin_x, origin_y=origin_y,
+                                     fps=fps)
+        for i in range(1, frames):
+            self.sprite.append_frame()
+        self.layers = layers
+        self.drawn = set()
+        self.size = int(self.sprite.width * self.sprite.height * 4 * frames)
+
+        # The first frame is what's shown when the sprite is drawn as
+        # a still image, e.g. inside a door.
+        self.draw_frame(0)
+
+    def draw_frame(self, frame):
+        frame = int(frame) % self.sprite.frames
+        if frame not in self.drawn:
+            self.drawn.add(frame)
+            self.sprite.draw_lock()
+            for sprite, image, x, y in self.layers:
+                if image is None:
+                    image = frame
+                self.sprite.draw_sprite(sprite, image, x, y, frame)
+            self.sprite.draw_unlock()
+
+
 def get_object(x, y, cls=None, **kwargs):
     cls = TYPES.get(cls, xsge_tiled.Decoration)
     return cls(x, y, **kwargs)
 
 
-def get_scaled_copy(obj):
-    s = obj.sprite.copy()
-    if obj.image_xscale < 0:
-        s.mirror()
-    if obj.image_yscale < 0:
-        s.flip()
-    s.width *= abs(obj.image_xscale)
-    s.height *= abs(obj.image_yscale)
-    s.rotate(obj.image_rotation)
-    s.origin_x = obj.image_origin_x
-    s.origin_y = obj.image_origin_y
-    if obj.image_blend:
-        blend_mode = obj.image_blend_mode
-        if blend_mode is None:
-            blend_mode = sge.BLEND_RGB_MULTIPLY
-        s.draw_rectangle(0, 0, s.width, s.height, fill=obj.image_blend,
-                         blend_mode=blend_mode)
-    if obj.image_alpha < 255:
-        c = sge.gfx.Color((255, 255, 255, obj.image_alpha))
-        s.draw_rectangle(0, 0, s.width, s.height, fill=c,
-                         blend_mode=sge.BLEND_RGBA_MULTIPLY)
+def get_scaled_sprite(obj, image=None):
+    """
+    Return a one-frame copy of frame ``image`` of the sprite of ``obj``
+    transformed the way ``obj`` shows it, with its origin at the
+    object's image origin.  If ``image`` is :const:`None`, the object's
+    current frame is used.  The last SCALED_SPRITE_CACHE_SIZE copies
+    used are kept, so the returned sprite must not be modified.
+    """
+    if image is None:
+        image = obj.image_index
+    image %= obj.sprite.frames
+    key = (obj.sprite, image, obj.image_origin_x, obj.image_origin_y,
+           obj.image_xscale, obj.image_yscale, obj.image_rotation,
+           str(obj.image_blend) if obj.image_blend else None,
+           obj.image_blend_mode, obj.image_alpha)
+    s = scaled_sprites.pop(key, None)
+    if s is None:
+        s = sge.gfx.Sprite(width=obj.sprite.width, height=obj.sprite.height)
+        s.draw_sprite(obj.sprite, image, obj.sprite.origin_x,
+                      obj.sprite.origin_y)
+        if obj.image_xscale < 0:
+            s.mirror()
+        if obj.image_yscale < 0:
+            s.flip()
+        s.width *= abs(obj.image_xscale)
+        s.height *= abs(obj.image_yscale)
+        s.rotate(obj.image_rotation)
+        s.origin_x = obj.image_origin_x
+        s.origin_y = obj.image_origin_y
+        if obj.image_blend:
+            blend_mode = obj.image_blend_mode
+            if blend_mode is None:
+                blend_mode = sge.BLEND_RGB_MULTIPLY
+            s.draw_rectangle(0, 0, s.width, s.height, fill=obj.image_blend,
+                             blend_mode=blend_mode)
+        if obj.image_alpha < 255:
+            c = sge.gfx.Color((255, 255, 255, obj.image_alpha))
+            s.draw_rectangle(0, 0, s.width, s.height, fill=c,
+                             blend_mode=sge.BLEND_RGBA_MULTIPLY)
+        while len(scaled_sprites) >= SCALED_SPRITE_CACHE_SIZE:
+            del scaled_sprites[next(iter(scaled_sprites))]
+
+    # Move the sprite to the end so eviction order is by last use.
+    scaled_sprites[key] = s
     return s
 
 
+def project_clipped(obj, z, left=0, top=0, right=None, bottom=None):
+    """
+    Project the current image of ``obj`` onto the current room at
+    depth ``z``, the way ``obj`` shows it, but only the part between
+    ``left``, ``top``, ``right`` and ``bottom``.  These are relative
+    to the top-left corner of the image; :const:`None` means the edge
+    of the image.
+    """
+    s = get_scaled_sprite(obj)
+    left = max(0, left)
+    top = max(0, top)
+    right = s.width if right is None else min(right, s.width)
+    bottom = s.height if bottom is None else min(bottom, s.height)
+    if right > left and bottom > top:
+        # Only the visible part of the frame is copied.
+        clip = sge.gfx.Sprite(width=right - left, height=bottom - top)
+        clip.draw_sprite(s, 0, s.origin_x - left, s.origin_y - top)
+        sge.game.current_room.project_sprite(
+            clip, 0, obj.x - s.origin_x + left, obj.y - s.origin_y + top, z)
+
+
+def get_surface_y(obj, left, right):
+    """
+    Return the height at which something falling onto ``obj`` between
+    ``left`` and ``right`` lands, or :data:`math.inf` if ``obj`` has no
+    top surface.
+    """
+    if isinstance(obj, xsge_physics.SolidTop):
+        return obj.bbox_top
+    elif isinstance(obj, xsge_physics.SlopeTopLeft):
+        return obj.get_slope_y(right)
+    elif isinstance(obj, xsge_physics.SlopeTopRight):
+        return obj.get_slope_y(left)
+    else:
+        return math.inf
+
+
 def get_jump_speed(height, gravity=GRAVITY):
     # Get the speed to achieve a given height using a kinematic
     # equation: v[f]^2 = v[i]^2 + 2ad
@@ -7494,8 +8790,442 @@ def show_error(message):
         print(message)
 
 
+def get_text_sprite(font, text, width=None, color="white", halign="left",
+                    valign="top", outline=None):
+    """
+    Return a sprite with ``text`` drawn on it, like
+    :meth:`sge.gfx.Sprite.from_text`.  ``color`` and ``outline`` are
+    color names or HTML-style hex strings, and outlines are
+    ``text_outline_thickness`` thick.  The last TEXT_SPRITE_CACHE_SIZE
+    sprites used are kept, so text which stays the same from frame to
+    frame is only drawn once.
+    """
+    outline_thickness = text_outline_thickness if outline is not None else 0
+    key = (font, text, width, color, halign, valign, outline,
+           outline_thickness)
+    sprite = text_sprites.pop(key, None)
+    if sprite is None:
+        sprite = sge.gfx.Sprite.from_text(
+            font, text, width=width, color=sge.gfx.Color(color),
+            halign=halign, valign=valign,
+            outline=sge.gfx.Color(outline) if outline is not None else None,
+            outline_thickness=outline_thickness)
+        while len(text_sprites) >= TEXT_SPRITE_CACHE_SIZE:
+            del text_sprites[next(iter(text_sprites))]
+
+    # Move the sprite to the end so eviction order is by last use.
+    text_sprites[key] = sprite
+    return sprite
+
+
+def get_sound(sound):
+    """
+    Return the decoded :class:`sge.snd.Sound` for the lazy sound
+    ``sound``, loading it if necessary, or :const:`None` if it can't be
+    loaded.
+    """
+    global loaded_sounds_size
+
+    if sound in loaded_sounds:
+        # Move the sound to the end so eviction order is by last use.
+        loaded = loaded_sounds.pop(sound)
+        loaded_sounds[sound] = loaded
+        return loaded
+
+    # Sounds which couldn't be loaded are kept out of the cache so they
+    # don't take part in its eviction order.
+    if sound in failed_sounds:
+        return None
+
+    parent = get_sound(sound.parent) if sound.parent is not None else None
+    try:
+        loaded = sge.snd.Sound(data_path("sounds", sound.fname),
+                               parent=parent)
+    except OSError as e:
+        warnings.warn(f"Couldn't load sound \"{sound.fname}\": {e}")
+        failed_sounds.add(sound)
+        return None
+
+    loaded_sounds[sound] = loaded
+    channels = 2 if sge.game.stereo else 1
+    sound.size = int(loaded.length / 1000 * sge.game.sampling_frequency
+                     * channels * 2)
+    loaded_sounds_size += sound.size
+
+    while loaded_sounds_size > SOUND_CACHE_SIZE:
+        for old in loaded_sounds:
+            if (old is not sound and old is not sound.parent
+                    and not sound_in_use(old)):
+                unload_sound(old)
+                break
+        else:
+            break
+
+    return loaded
+
+
+def sound_in_use(sound):
+    # Return whether the decoded sound of the lazy sound ``sound`` or
+    # of any loaded sound that uses it as its parent is playing.
+    # Unloading a sound unloads those sounds too.
+    loaded = loaded_sounds.get(sound)
+    if loaded is not None and loaded.playing:
+        return True
+
+    return any(sound_in_use(child) for child in loaded_sounds
+               if child.parent is sound)
+
+
+def unload_sound(sound):
+    # Drop the decoded sound of the lazy sound ``sound`` and of any
+    # loaded sounds that use it as their parent.
+    global loaded_sounds_size
+
+    for child in [s for s in loaded_sounds if s.parent is sound]:
+        unload_sound(child)
+
+    loaded = loaded_sounds.pop(sound, None)
+    if loaded is not None:
+        if sound.parent is None:
+            # Give the sound's reserved channels back to the mixer.
+            loaded.max_play = 0
+        loaded_sounds_size -= sound.size
+        sound.size = 0
+
+
+def get_cached_grab_sprite(key):
+    # Return the grab sprite cached under ``key``, or None.
+    grab = tux_grab_sprites.pop(key, None)
+    if grab is not None:
+        # Move the sprite to the end so eviction order is by last use.
+        tux_grab_sprites[key] = grab
+    return grab
+
+
+def cache_grab_sprite(key, grab):
+    # Cache the grab sprite ``grab`` under ``key`` and evict the least
+    # recently used grab sprites while the cache's total size exceeds
+    # GRAB_SPRITE_CACHE_SIZE.  Players showing an evicted sprite keep
+    # it until they ask for a new one.
+    global tux_grab_sprites_size
+
+    tux_grab_sprites[key] = grab
+    tux_grab_sprites_size += grab.size
+    while tux_grab_sprites_size > GRAB_SPRITE_CACHE_SIZE:
+        old = next(iter(tux_grab_sprites))
+        if old == key:
+            break
+        tux_grab_sprites_size -= tux_grab_sprites.pop(old).size
+
+
+def acquire_background(name):
+    """
+    Return the background called ``name``, building it if it isn't
+    loaded yet, and count a reference to it.  Return :const:`None` if
+    there is no such background.
+    """
+    background = backgrounds.get(name)
+    if background is None:
+        build = background_builders.get(name)
+        if build is None:
+            return None
+        background = build()
+        backgrounds[name] = background
+
+    background_refs[name] = background_refs.get(name, 0) + 1
+    return background
+
+
+def release_background(name):
+    # Drop a reference to background ``name``, unloading it once no
+    # loaded room uses it anymore.
+    refs = background_refs.get(name, 0) - 1
+    if refs > 0:
+        background_refs[name] = refs
+    else:
+        background_refs.pop(name, None)
+        backgrounds.pop(name, None)
+
+
+def preload_level(fname):
+    """
+    Queue level ``fname`` to be read on the background preloading
+    thread.  The map data is put in ``loaded_levels``, where
+    :meth:`Level.load` picks it up and builds the level from it.
+    Until then, ``MAP_RESERVE_MEMORY`` bytes are counted for it in
+    ``loaded_level_sizes``.  Return whether the level was queued.
+    """
+    global preload_thread
+
+    with preload_lock:
+        if (fname in current_areas or fname in loaded_levels
+                or fname in preloading_levels):
+            return False
+
+        preloading_levels[fname] = threading.Event()
+        loaded_level_sizes[fname] = MAP_RESERVE_MEMORY
+
+    preload_queue.put(fname)
+    if preload_thread is None:
+        preload_thread = threading.Thread(target=preload_level_thread,
+                                          daemon=True)
+        preload_thread.start()
+
+    return True
+
+
+def preload_level_thread():
+    # Levels are read one at a time so that preloading never takes
+    # more than one thread's worth of time away from the game.  Only
+    # the map data is read here; building the room loads sprites and
+    # uses shared caches, so Level.load does that on the main thread.
+    # Errors are logged and otherwise ignored; Level.load will try
+    # again and report them if the level turns out to be needed.
+    while True:
+        fname = preload_queue.get()
+        try:
+            tilemap = read_map(os.path.join("levels", fname))
+            size = estimate_map_memory(tilemap)
+        except Exception:
+            print(_("An error occurred when trying to preload level "
+                    "\"{}\":").format(fname), file=sys.stderr)
+            traceback.print_exc()
+            with preload_lock:
+                loaded_level_sizes.pop(fname, None)
+                preloading_levels.pop(fname).set()
+        else:
+            with preload_lock:
+                loaded_levels[fname] = tilemap
+                loaded_level_sizes[fname] = size
+                preloading_levels.pop(fname).set()
+
+
+def estimate_map_memory(tilemap):
+    # Return a rough estimate of the memory used by map data
+    # ``tilemap`` in bytes: its tile arrays plus a fixed cost per
+    # object.
+    size = 0
+    layers = list(tilemap.get("layers", []))
+    while layers:
+        layer = layers.pop()
+        layers.extend(layer.get("layers", []))
+        size += len(layer.get("objects", [])) * MAP_OBJECT_MEMORY
+        for part in [layer] + layer.get("chunks", []):
+            data = part.get("data")
+            if isinstance(data, array.array):
+                size += len(data) * data.itemsize
+
+    return size
+
+
+def trim_loaded_levels(keep=(), needed=0):
+    """
+    Drop preloaded levels not listed in ``keep``, oldest first, until
+    ``needed`` more bytes fit in ``preload_memory`` megabytes along
+    with the preloaded levels.  Levels which are still being read
+    can't be dropped.  Return the number of bytes counted for
+    preloaded levels afterwards.
+    """
+    limit = preload_memory * 1024 * 1024
+    with preload_lock:
+        total = sum(loaded_level_sizes.values())
+        for fname in list(loaded_levels.keys()):
+            if total + needed <= limit:
+                break
+            if fname not in keep:
+                del loaded_levels[fname]
+                total -= loaded_level_sizes.pop(fname)
+
+    return total
+
+
+def parse_timeline_command(command):
+    """
+    Parse timeline command string ``command`` into a tuple of the form
+    ``(command, arg, args)``, where ``args`` holds the arguments the
+    command needs already split up, or :const:`None` if the command
+    can't do anything.  Return :const:`None` for comments and blank
+    commands.
+    """
+    command = command.split(None, 1)
+    if not command or command[0].startswith("#"):
+        return None
+
+    if len(command) >= 2:
+        command, arg = command[:2]
+    else:
+        command = command[0]
+        arg = ""
+
+    args = arg
+    if command == "setattr":
+        args = arg.split(None, 2)
+        args = tuple(args) if len(args) >= 3 else None
+    elif command == "call":
+        args = arg.split()
+        args = (args[0], args[1], tuple(args[2:])) if len(args) >= 2 else None
+    elif command == "dialog":
+        args = arg.split(None, 1)
+        args = tuple(args) if len(args) >= 2 else None
+    elif command == "skip_to":
+        try:
+            args = float(arg)
+        except ValueError:
+            args = None
+
+    return (command, arg, args)
+
+
+def compile_timeline(jt):
+    """
+    Return the timeline described by the JSON object ``jt`` as a
+    dictionary mapping each step to a tuple of parsed commands (see
+    :func:`parse_timeline_command`).
+    """
+    timeline = {}
+    for i in jt:
+        commands = [parse_timeline_command(command) for command in jt[i]]
+        commands = tuple(command for command in commands
+                         if command is not None)
+        if commands:
+            timeline[eval(i)] = commands
+
+    return timeline
+
+
+def get_timeline(name):
+    """
+    Return the compiled version of timeline file ``name`` (see
+    :func:`compile_timeline`) and a tuple of its steps in order.
+
+    Compiled timelines are cached for as long as their files are
+    unchanged and are shared by every level using them, so they are
+    returned as read-only mappings of tuples.  A level which needs to
+    change its timeline must replace it with a copy first.
+    """
+    fname = data_path("timelines", name)
+    st = os.stat(fname)
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = loaded_timelines.get(fname)
+    if cached is not None and cached[0] == stamp:
+        return cached[1:]
+
+    with open(fname, 'r') as f:
+        jt = json.load(f)
+
+    timeline = types.MappingProxyType(compile_timeline(jt))
+    keys = tuple(sorted(timeline.keys()))
+    loaded_timelines[fname] = (stamp, timeline, keys)
+    return timeline, keys
+
+
+def get_timeline_code(source, mode="eval"):
+    """
+    Return the code object for the timeline expression (or, if ``mode``
+    is ``"exec"``, statements) ``source``.  Code objects are compiled
+    the first time they are needed and shared from then on.
+    """
+    key = (source, mode)
+    code = timeline_code.get(key)
+    if code is None:
+        code = compile(source, "<timeline>", mode)
+        timeline_code[key] = code
+
+    return code
+
+
+def save_recording(fname, level, inputs, length=None):
+    """
+    Save the player input recording ``inputs`` of level ``level`` to
+    ``fname``.  ``inputs`` maps the ID of each recorded player to a
+    list of ``(step, mask)`` tuples, one for each step the player's
+    buttons changed, with masks made of INPUT_* bits.  ``length`` is
+    the number of steps the recording lasts, if known.
+
+    The file consists of the magic bytes "RTXR", the format version as
+    a little-endian unsigned 16-bit integer, the length of a UTF-8
+    JSON header as a little-endian unsigned 32-bit integer, and the
+    header itself, which holds the level, the length and the IDs of
+    the players.
+    The header is followed by a stream for each player in the same
+    order: its length in bytes as a little-endian unsigned 32-bit
+    integer, then for each change the number of steps since the
+    previous change as an unsigned LEB128 integer and the new mask as
+    a single byte.
+    """
+    header = json.dumps({"level": level, "length": length,
+                         "players": list(inputs.keys())})
+    header = header.encode("utf-8")
+    data = bytearray(RECORDING_MAGIC)
+    data += struct.pack("<HI", RECORDING_VERSION, len(header))
+    data += header
+    for i in inputs:
+        stream = bytearray()
+        last_step = 0
+        for step, mask in inputs[i]:
+            delta = step - last_step
+            last_step = step
+            while delta >= 0x80:
+                stream.append((delta & 0x7F) | 0x80)
+                delta >>= 7
+            stream.append(delta)
+            stream.append(mask)
+
+        data += struct.pack("<I", len(stream))
+        data += stream
+
+    with open(fname, 'wb') as f:
+        f.write(data)
+
+
+def load_recording(fname):
+    """
+    Load the player input recording saved in ``fname`` by
+    :func:`save_recording` and return it as a tuple of the form
+    ``(level, inputs, length)``.
+    """
+    with open(fname, 'rb') as f:
+        data = f.read()
+
+    if data[:4] != RECORDING_MAGIC:
+        raise ValueError('"{}" is not a ReTux recording.'.format(fname))
+    version, header_size = struct.unpack_from("<HI", data, 4)
+    if version != RECORDING_VERSION:
+        e = 'Recording version {} not supported.'.format(version)
+        raise ValueError(e)
+
+    pos = 4 + struct.calcsize("<HI")
+    header = json.loads(data[pos:pos + header_size].decode("utf-8"))
+    pos += header_size
+
+    inputs = {}
+    for i in header["players"]:
+        size, = struct.unpack_from("<I", data, pos)
+        pos += 4
+        end = pos + size
+        step = 0
+        changes = []
+        while pos < end:
+            delta = 0
+            shift = 0
+            while data[pos] & 0x80:
+                delta |= (data[pos] & 0x7F) << shift
+                shift += 7
+                pos += 1
+            delta |= data[pos] << shift
+            step += delta
+            changes.append((step, data[pos + 1]))
+            pos += 2
+        inputs[i] = changes
+
+    return header["level"], inputs, header.get("length")
+
+
 def play_sound(sound, x=None, y=None, force=True):
-    if sound_volume and sound:
+    if sound_volume and sound and not HEADLESS:
+        if profiler is not None:
+            profiler.begin("audio")
+
         if x is None or y is None:
             sound.play(volume=sound_volume, force=force)
         else:
@@ -7533,6 +9263,8 @@ def play_sound(sound, x=None, y=None, force=True):
                 volume = min(1, abs(reldist / rng))
             else:
                 # No point in continuing; it's too far away
+                if profiler is not None:
+                    profiler.end()
                 return
 
             if stereo_enabled:
@@ -7549,18 +9281,26 @@ def play_sound(sound, x=None, y=None, force=True):
             sound.play(volume=(volume * sound_volume), balance=balance,
                        force=force)
 
+        if profiler is not None:
+            profiler.end()
+
 
 def play_music(music, force_restart=False):
     """Play the given music file, starting with its start piece."""
-    if music_volume and music:
+    if music_volume and music and not HEADLESS:
+        if profiler is not None:
+            profiler.begin("audio")
+
         music_object = loaded_music.get(music)
         if music_object is None:
             try:
-                music_object = sge.snd.Music(os.path.join(DATA, "music",
-                                                          music))
+                music_object = sge.snd.Music(data_path("music",
+                                                       music))
             except OSError:
                 sge.snd.Music.clear_queue()
                 sge.snd.Music.stop()
+                if profiler is not None:
+                    profiler.end()
                 return
             else:
                 loaded_music[music] = music_object
@@ -7573,8 +9313,8 @@ def play_music(music, force_restart=False):
         music_start_object = loaded_music.get(music_start)
         if music_start_object is None:
             try:
-                music_start_object = sge.snd.Music(os.path.join(DATA, "music",
-                                                                music_start))
+                music_start_object = sge.snd.Music(data_path("music",
+                                                             music_start))
             except OSError:
                 pass
             else:
@@ -7593,6 +9333,9 @@ def play_music(music, force_restart=False):
                 music_object.queue(loops=None)
             else:
                 music_object.play(loops=None)
+
+        if profiler is not None:
+            profiler.end()
     else:
         sge.snd.Music.clear_queue()
         sge.snd.Music.stop()
@@ -7629,7 +9372,7 @@ def load_levelset(fname):
         current_levelset = fname
 
         try:
-            with open(os.path.join(DATA, "levelsets", fname), 'r') as f:
+            with open(data_path("levelsets", fname), 'r') as f:
                 data = json.load(f)
         except Exception as e:
             show_error(str(e))
@@ -7683,6 +9426,7 @@ def write_to_disk():
            "scale_proportional": scale_proportional,
            "sound_volume": sound_volume, "music_volume": music_volume,
            "stereo_enabled": stereo_enabled, "fps_enabled": fps_enabled,
+           "preload_memory": preload_memory,
            "joystick_threshold": joystick_threshold, "keys": keys_cfg,
            "joystick": js_cfg}
 
@@ -7846,25 +9590,23 @@ def warp(dest):
             level.name = cr.name
             level.points = cr.points
 
-            for nobj in level.objects[:]:
-                if isinstance(nobj, Player):
-                    for cobj in cr.objects[:]:
-                        if (isinstance(cobj, Player) and
-                                cobj.player == nobj.player):
-                            nobj.hp = cobj.hp
-                            nobj.coins = cobj.coins
-                            nobj.facing = cobj.facing
-                            nobj.image_xscale = cobj.image_xscale
-                            nobj.image_yscale = cobj.image_yscale
-
-                            held_object = cobj.held_object
-                            if held_object is not None:
-                                cobj.drop_object()
-                                cr.remove(held_object)
-                                level.add(held_object)
-                                nobj.pickup(held_object)
-
-                            break
+            for nobj in level.players[:]:
+                for cobj in cr.players[:]:
+                    if cobj.player == nobj.player:
+                        nobj.hp = cobj.hp
+                        nobj.coins = cobj.coins
+                        nobj.facing = cobj.facing
+                        nobj.image_xscale = cobj.image_xscale
+                        nobj.image_yscale = cobj.image_yscale
+
+                        held_object = cobj.held_object
+                        if held_object is not None:
+                            cobj.drop_object()
+                            cr.remove(held_object)
+                            level.add(held_object)
+                            nobj.pickup(held_object)
+
+                        break
 
             level.start()
         else:
@@ -7873,47 +9615,6 @@ def warp(dest):
             sge.game.start_room.start()
 
 
-def _data_decode(data, encoding, compression):
-    # Decode encoded data and return a list of integers it represents.
-    #
-    # Arguments:
-    #
-    # - ``data`` -- The data to decode.
-    # - ``encoding`` -- The encoding of the data.  Can be ``"base64"``
-    #   or ``"csv"``.
-    # - ``compression`` -- The compression method used.  Valid
-    #   compression methods are ``"gzip"`` and ``"zlib"``.
-    #   Set to ``None`` for no compression.
-    if isinstance(data, str):
-        if encoding == "csv":
-            return [int(i) for i in data.strip().split(",")]
-        elif encoding == "base64":
-            data = base64.b64decode(data.strip().encode("latin1"))
-
-            if compression == "gzip":
-                data = gzip.decompress(data)
-            elif compression == "zlib":
-                data = zlib.decompress(data)
-            elif compression:
-                e = 'Compression type "{}" not supported.'.format(compression)
-                raise ValueError(e)
-
-            ndata = [i for i in data]
-
-            data = []
-            for i in range(0, len(ndata), 4):
-                n = (ndata[i]  + ndata[i + 1] * (2 ** 8) +
-                     ndata[i + 2] * (2 ** 16) + ndata[i + 3] * (2 ** 24))
-                data.append(n)
-
-            return data
-        else:
-            e = 'Encoding type "{}" not supported.'.format(encoding)
-            raise ValueError(e)
-    else:
-        return data
-
-
 def _refresh_screen(time_passed, delta_mult):
     # Wrapper for sge.game.refresh() which also calls the paused step
     # events, in case they make any changes to the screen by way of
@@ -7926,6 +9627,11 @@ def _refresh_screen(time_passed, delta_mult):
     sge.game.refresh()
 
 
+# Solids and slopes which never move, whose top surfaces are kept in
+# each level's crash line heightmap.
+CRASH_LINE_TYPES = (Solid, SolidTop, SlopeTopLeft, SlopeTopRight, SpikeLeft,
+                    SpikeRight, SpikeBottom)
+
 TYPES = {"solid_left": SolidLeft, "solid_right": SolidRight,
          "solid_top": SolidTop, "solid_bottom": SolidBottom, "solid": Solid,
          "slope_topleft": SlopeTopLeft, "slope_topright": SlopeTopRight,
@@ -7966,9 +9672,10 @@ TYPES = {"solid_left": SolidLeft, "solid_right": SolidRight,
 
 
 print(_("Initializing game system..."))
-Game(SCREEN_SIZE[0], SCREEN_SIZE[1], fps=FPS, delta=DELTA, delta_min=DELTA_MIN,
-     delta_max=DELTA_MAX, window_text="reTux {}".format(__version__),
-     window_icon=os.path.join(DATA, "images", "misc", "icon.png"))
+(HeadlessGame if HEADLESS else Game)(
+    SCREEN_SIZE[0], SCREEN_SIZE[1], fps=FPS, delta=DELTA, delta_min=DELTA_MIN,
+    delta_max=DELTA_MAX, window_text="reTux {}".format(__version__),
+    window_icon=data_path("images", "misc", "icon.png"))
 
 print(_("Initializing GUI system..."))
 xsge_gui.init()
@@ -7983,40 +9690,40 @@ else:
 
 # Load sprites
 print(_("Loading images..."))
-d = os.path.join(DATA, "images", "objects", "tux")
-tux_body_stand_sprite = sge.gfx.Sprite(
+d = os.path.join("images", "objects", "tux")
+tux_body_stand_sprite = load_sprite(
     "tux_body_stand", d, origin_x=TUX_ORIGIN_X, origin_y=TUX_ORIGIN_Y)
-tux_arms_stand_sprite = sge.gfx.Sprite(
+tux_arms_stand_sprite = load_sprite(
     "tux_arms_stand", d, origin_x=TUX_ORIGIN_X, origin_y=TUX_ORIGIN_Y)
-tux_body_walk_sprite = sge.gfx.Sprite(
+tux_body_walk_sprite = load_sprite(
     "tux_body_walk", d, origin_x=TUX_ORIGIN_X, origin_y=TUX_ORIGIN_Y)
-tux_arms_walk_sprite = sge.gfx.Sprite(
+tux_arms_walk_sprite = load_sprite(
     "tux_arms_walk", d, origin_x=TUX_ORIGIN_X, origin_y=TUX_ORIGIN_Y)
-tux_body_run_sprite = sge.gfx.Sprite(
+tux_body_run_sprite = load_sprite(
     "tux_body_run", d, origin_x=TUX_ORIGIN_X, origin_y=TUX_ORIGIN_Y)
-tux_arms_run_sprite = sge.gfx.Sprite(
+tux_arms_run_sprite = load_sprite(
     "tux_arms_run", d, origin_x=TUX_ORIGIN_X, origin_y=TUX_ORIGIN_Y)
-tux_body_skid_sprite = sge.gfx.Sprite(
+tux_body_skid_sprite = load_sprite(
     "tux_body_skid", d, origin_x=TUX_ORIGIN_X, origin_y=TUX_ORIGIN_Y)
-tux_arms_skid_sprite = sge.gfx.Sprite(
+tux_arms_skid_sprite = load_sprite(
     "tux_arms_skid", d, origin_x=TUX_ORIGIN_X, origin_y=TUX_ORIGIN_Y)
-tux_body_jump_sprite = sge.gfx.Sprite(
+tux_body_jump_sprite = load_sprite(
     "tux_body_jump", d, origin_x=TUX_ORIGIN_X, origin_y=TUX_ORIGIN_Y)
-tux_arms_jump_sprite = sge.gfx.Sprite(
+tux_arms_jump_sprite = load_sprite(
     "tux_arms_jump", d, origin_x=TUX_ORIGIN_X, origin_y=TUX_ORIGIN_Y)
 tux_body_fall_sprite = tux_body_jump_sprite.copy()
-tux_arms_fall_sprite = sge.gfx.Sprite(
+tux_arms_fall_sprite = load_sprite(
     "tux_arms_fall", d, origin_x=TUX_ORIGIN_X, origin_y=TUX_ORIGIN_Y)
-tux_body_kick_sprite = sge.gfx.Sprite(
+tux_body_kick_sprite = load_sprite(
     "tux_body_kick", d, origin_x=TUX_ORIGIN_X, origin_y=TUX_ORIGIN_Y)
-tux_arms_kick_sprite = sge.gfx.Sprite(
+tux_arms_kick_sprite = load_sprite(
     "tux_arms_kick", d, origin_x=TUX_ORIGIN_X, origin_y=TUX_ORIGIN_Y)
-tux_arms_grab_sprite = sge.gfx.Sprite(
+tux_arms_grab_sprite = load_sprite(
     "tux_arms_grab", d, origin_x=TUX_ORIGIN_X, origin_y=TUX_ORIGIN_Y)
-tux_arms_skid_grab_sprite = sge.gfx.Sprite(
+tux_arms_skid_grab_sprite = load_sprite(
     "tux_arms_skid_grab", d, origin_x=TUX_ORIGIN_X, origin_y=TUX_ORIGIN_Y)
-tux_die_sprite = sge.gfx.Sprite("tux_die", d, origin_x=29, origin_y=11, fps=8)
-tux_offscreen_sprite = sge.gfx.Sprite("tux_offscreen", d, origin_x=16)
+tux_die_sprite = load_sprite("tux_die", d, origin_x=29, origin_y=11, fps=8)
+tux_offscreen_sprite = load_sprite("tux_offscreen", d, origin_x=16)
 
 if GOD:
     def supertux_shader(x, y, red, green, blue, alpha):
@@ -8028,480 +9735,518 @@ if GOD:
             blue = int(253 * blue / 255)
         return (red, green, blue, alpha)
 
-    for s in [tux_body_stand_sprite, tux_body_walk_sprite, tux_body_run_sprite,
-              tux_body_skid_sprite, tux_body_jump_sprite, tux_body_fall_sprite,
-              tux_body_kick_sprite, tux_arms_stand_sprite, tux_arms_walk_sprite,
-              tux_arms_run_sprite, tux_arms_skid_sprite, tux_arms_jump_sprite,
-              tux_arms_fall_sprite, tux_arms_kick_sprite,
-              tux_arms_grab_sprite, tux_arms_skid_grab_sprite, tux_die_sprite,
-              tux_offscreen_sprite]:
+    def build_god_sprite(s):
         s.draw_shader(0, 0, s.width, s.height, supertux_shader)
-
-tux_stand_sprite = tux_body_stand_sprite.copy()
-tux_walk_sprite = tux_body_walk_sprite.copy()
-tux_run_sprite = tux_body_run_sprite.copy()
-tux_skid_sprite = tux_body_skid_sprite.copy()
-tux_jump_sprite = tux_body_jump_sprite.copy()
-tux_fall_sprite = tux_body_fall_sprite.copy()
-tux_kick_sprite = tux_body_kick_sprite.copy()
-
-for bs, a in [(tux_stand_sprite, tux_arms_stand_sprite),
-              (tux_walk_sprite, tux_arms_walk_sprite),
-              (tux_run_sprite, tux_arms_run_sprite),
-              (tux_skid_sprite, tux_arms_skid_sprite),
-              (tux_jump_sprite, tux_arms_jump_sprite),
-              (tux_fall_sprite, tux_arms_fall_sprite),
-              (tux_kick_sprite, tux_arms_kick_sprite)]:
+        return s
+
+    # The shader runs per pixel in Python, so its results are cached.
+    # Every Tux sprite is keyed on all of Tux's image files since
+    # tux_body_fall_sprite has no files of its own.
+    tux_sources = [os.path.join(d, fname) for fname in data_listdir(d)]
+    god_sprites = [
+        tux_body_stand_sprite, tux_body_walk_sprite, tux_body_run_sprite,
+        tux_body_skid_sprite, tux_body_jump_sprite, tux_body_fall_sprite,
+        tux_body_kick_sprite, tux_arms_stand_sprite, tux_arms_walk_sprite,
+        tux_arms_run_sprite, tux_arms_skid_sprite, tux_arms_jump_sprite,
+        tux_arms_fall_sprite, tux_arms_kick_sprite, tux_arms_grab_sprite,
+        tux_arms_skid_grab_sprite, tux_die_sprite, tux_offscreen_sprite]
+    for i, s in enumerate(god_sprites):
+        god_sprites[i] = cached_sprite("god_tux-{}".format(i), tux_sources,
+                                       lambda: build_god_sprite(s),
+                                       [code_stamp(supertux_shader)])
+
+    (tux_body_stand_sprite, tux_body_walk_sprite, tux_body_run_sprite,
+     tux_body_skid_sprite, tux_body_jump_sprite, tux_body_fall_sprite,
+     tux_body_kick_sprite, tux_arms_stand_sprite, tux_arms_walk_sprite,
+     tux_arms_run_sprite, tux_arms_skid_sprite, tux_arms_jump_sprite,
+     tux_arms_fall_sprite, tux_arms_kick_sprite, tux_arms_grab_sprite,
+     tux_arms_skid_grab_sprite, tux_die_sprite,
+     tux_offscreen_sprite) = god_sprites
+    del god_sprites
+
+
+def build_tux_sprite(body, arms):
+    bs = body.copy()
     for i in range(bs.frames):
-        bs.draw_sprite(a, i, bs.origin_x, bs.origin_y, i)
-
-d = os.path.join(DATA, "images", "objects", "enemies")
-snowball_walk_sprite = sge.gfx.Sprite("snowball", d, origin_x=19, origin_y=4,
-                                      fps=8, bbox_x=-13, bbox_y=0,
-                                      bbox_width=26, bbox_height=32)
-bouncing_snowball_sprite = sge.gfx.Sprite(
+        bs.draw_sprite(arms, i, bs.origin_x, bs.origin_y, i)
+    return bs
+
+
+tux_sprites = []
+for name, body, arms in [("stand", tux_body_stand_sprite,
+                          tux_arms_stand_sprite),
+                         ("walk", tux_body_walk_sprite, tux_arms_walk_sprite),
+                         ("run", tux_body_run_sprite, tux_arms_run_sprite),
+                         ("skid", tux_body_skid_sprite, tux_arms_skid_sprite),
+                         ("jump", tux_body_jump_sprite, tux_arms_jump_sprite),
+                         ("fall", tux_body_fall_sprite, tux_arms_fall_sprite),
+                         ("kick", tux_body_kick_sprite,
+                          tux_arms_kick_sprite)]:
+    body_name = "tux_body_jump" if name == "fall" else "tux_body_" + name
+    sources = (sprite_files(d, body_name)
+               + sprite_files(d, "tux_arms_" + name))
+    tux_sprites.append(cached_sprite("tux_" + name, sources,
+                                     lambda: build_tux_sprite(body, arms)))
+
+(tux_stand_sprite, tux_walk_sprite, tux_run_sprite, tux_skid_sprite,
+ tux_jump_sprite, tux_fall_sprite, tux_kick_sprite) = tux_sprites
+del tux_sprites
+
+d = os.path.join("images", "objects", "enemies")
+snowball_walk_sprite = load_sprite("snowball", d, origin_x=19, origin_y=4,
+                                   fps=8, bbox_x=-13, bbox_y=0,
+                                   bbox_width=26, bbox_height=32)
+bouncing_snowball_sprite = load_sprite(
     "bouncing_snowball", d, origin_x=17, origin_y=0, fps=8, bbox_x=-13,
     bbox_y=0, bbox_width=26, bbox_height=32)
-snowball_squished_sprite = sge.gfx.Sprite("snowball_squished", d, origin_x=17,
-                                          origin_y=-19, bbox_x=-13, bbox_y=19,
-                                          bbox_width=26, bbox_height=13)
-crystallo_walk_sprite = sge.gfx.Sprite(
+snowball_squished_sprite = load_sprite("snowball_squished", d, origin_x=17,
+                                       origin_y=-19, bbox_x=-13, bbox_y=19,
+                                       bbox_width=26, bbox_height=13)
+crystallo_walk_sprite = load_sprite(
     "crystallo", d, origin_x=23, origin_y=-5, fps=8, bbox_x=-20, bbox_y=8,
     bbox_width=40, bbox_height=24)
-crystallo_squished_sprite = sge.gfx.Sprite(
+crystallo_squished_sprite = load_sprite(
     "crystallo_squished", d, origin_x=23, origin_y=-17, bbox_x=-20, bbox_y=19,
     bbox_width=40, bbox_height=13)
-iceblock_walk_sprite = sge.gfx.Sprite(
+iceblock_walk_sprite = load_sprite(
     "iceblock", d, origin_x=18, origin_y=6, fps=10, bbox_x=-13, bbox_y=1,
     bbox_width=25, bbox_height=31)
-iceblock_flat_sprite = sge.gfx.Sprite("iceblock_flat", d, origin_x=18,
-                                      origin_y=3, bbox_x=-16, bbox_y=4,
-                                      bbox_width=31, bbox_height=28)
-spiky_walk_sprite = sge.gfx.Sprite("spiky", d, origin_x=22, origin_y=10, fps=8,
-                                   bbox_x=-13, bbox_y=0, bbox_width=26,
-                                   bbox_height=32)
-spiky_iced_sprite = sge.gfx.Sprite("spiky_iced", d, origin_x=22, origin_y=10,
-                                   fps=THAW_FPS, bbox_x=-13, bbox_y=0,
-                                   bbox_width=26, bbox_height=32)
+iceblock_flat_sprite = load_sprite("iceblock_flat", d, origin_x=18,
+                                   origin_y=3, bbox_x=-16, bbox_y=4,
+                                   bbox_width=31, bbox_height=28)
+spiky_walk_sprite = load_sprite("spiky", d, origin_x=22, origin_y=10, fps=8,
+                                bbox_x=-13, bbox_y=0, bbox_width=26,
+                                bbox_height=32)
+spiky_iced_sprite = load_sprite("spiky_iced", d, origin_x=22, origin_y=10,
+                                fps=THAW_FPS, bbox_x=-13, bbox_y=0,
+                                bbox_width=26, bbox_height=32)
 spiky_iced_sprite.append_frame()
 spiky_iced_sprite.draw_sprite(spiky_walk_sprite, 1, spiky_walk_sprite.origin_x,
                               spiky_walk_sprite.origin_y, frame=1)
-bomb_walk_sprite = sge.gfx.Sprite("bomb", d, origin_x=21, origin_y=8, fps=8,
-                                  bbox_x=-13, bbox_y=0, bbox_width=26,
-                                  bbox_height=32)
-bomb_iced_sprite = sge.gfx.Sprite("bomb_iced", d, origin_x=21, origin_y=8,
-                                  fps=THAW_FPS, bbox_x=-13, bbox_y=0,
-                                  bbox_width=26, bbox_height=32)
+bomb_walk_sprite = load_sprite("bomb", d, origin_x=21, origin_y=8, fps=8,
+                               bbox_x=-13, bbox_y=0, bbox_width=26,
+                               bbox_height=32)
+bomb_iced_sprite = load_sprite("bomb_iced", d, origin_x=21, origin_y=8,
+                               fps=THAW_FPS, bbox_x=-13, bbox_y=0,
+                               bbox_width=26, bbox_height=32)
 bomb_iced_sprite.append_frame()
 bomb_iced_sprite.draw_sprite(bomb_walk_sprite, 1, bomb_iced_sprite.origin_x,
                              bomb_iced_sprite.origin_y, frame=1)
-bomb_ticking_sprite = sge.gfx.Sprite(
+bomb_ticking_sprite = load_sprite(
     "bomb_ticking", d, origin_x=21, origin_y=5, bbox_x=-13, bbox_y=3,
     bbox_width=26, bbox_height=29)
 bomb_ticking_sprite.fps = bomb_ticking_sprite.frames / BOMB_TICK_TIME
-jumpy_sprite = sge.gfx.Sprite("jumpy", d, origin_x=24, origin_y=13, bbox_x=-16,
-                              bbox_y=0, bbox_width=32, bbox_height=32)
-jumpy_bounce_sprite = sge.gfx.Sprite(
+jumpy_sprite = load_sprite("jumpy", d, origin_x=24, origin_y=13, bbox_x=-16,
+                           bbox_y=0, bbox_width=32, bbox_height=32)
+jumpy_bounce_sprite = load_sprite(
     "jumpy_bounce", d, origin_x=24, origin_y=13, bbox_x=-16, bbox_y=0,
     bbox_width=32, bbox_height=32)
-jumpy_iced_sprite = sge.gfx.Sprite("jumpy_iced", d, origin_x=24, origin_y=13,
-                                   fps=THAW_FPS, bbox_x=-16, bbox_y=0,
-                                   bbox_width=32, bbox_height=32)
+jumpy_iced_sprite = load_sprite("jumpy_iced", d, origin_x=24, origin_y=13,
+                                fps=THAW_FPS, bbox_x=-16, bbox_y=0,
+                                bbox_width=32, bbox_height=32)
 jumpy_iced_sprite.append_frame()
 jumpy_iced_sprite.draw_sprite(jumpy_sprite, 0, jumpy_sprite.origin_x,
                               jumpy_sprite.origin_y, frame=1)
-flying_snowball_sprite = sge.gfx.Sprite(
+flying_snowball_sprite = load_sprite(
     "flying_snowball", d, origin_x=20, origin_y=11, fps=15, bbox_x=-13,
     bbox_y=0, bbox_width=26, bbox_height=32)
-flying_snowball_squished_sprite = sge.gfx.Sprite(
+flying_snowball_squished_sprite = load_sprite(
     "flying_snowball_squished", d, origin_x=20, origin_y=-11, bbox_x=-13,
     bbox_y=11, bbox_width=26, bbox_height=21)
-flying_spiky_sprite = sge.gfx.Sprite("flying_spiky", d, origin_x=24,
-                                     origin_y=14, fps=15, bbox_x=-13, bbox_y=0,
-                                     bbox_width=26, bbox_height=32)
-flying_spiky_iced_sprite = sge.gfx.Sprite(
+flying_spiky_sprite = load_sprite("flying_spiky", d, origin_x=24,
+                                  origin_y=14, fps=15, bbox_x=-13, bbox_y=0,
+                                  bbox_width=26, bbox_height=32)
+flying_spiky_iced_sprite = load_sprite(
     "flying_spiky_iced", d, origin_x=24, origin_y=14, fps=THAW_FPS, bbox_x=-13,
     bbox_y=0, bbox_width=26, bbox_height=32)
 flying_spiky_iced_sprite.append_frame()
 flying_spiky_iced_sprite.draw_sprite(flying_spiky_sprite, 0,
                                      flying_spiky_sprite.origin_x,
                                      flying_spiky_sprite.origin_y, frame=1)
-icicle_sprite = sge.gfx.Sprite("icicle", d, bbox_x=0, bbox_y=0, bbox_width=32,
-                               bbox_height=48)
-icicle_broken_sprite = sge.gfx.Sprite("icicle_broken", d, bbox_x=0, bbox_y=32,
-                                      bbox_width=32, bbox_height=16)
-krush_sprite = sge.gfx.Sprite("krush", d, origin_x=1, bbox_x=0, bbox_y=0,
-                              bbox_width=64, bbox_height=64)
-krosh_sprite = sge.gfx.Sprite("krosh", d, origin_x=2, bbox_x=0, bbox_y=0,
-                              bbox_width=128, bbox_height=128)
-circoflame_sprite = sge.gfx.Sprite("circoflame", d, origin_x=16, origin_y=16,
-                                   fps=8, bbox_x=-8, bbox_y=-8, bbox_width=16,
-                                   bbox_height=16)
-snowman_stand_sprite = sge.gfx.Sprite("snowman_stand", d, origin_x=28,
-                                      origin_y=43, bbox_x=-17, bbox_y=-40,
-                                      bbox_width=34, bbox_height=72)
-snowman_walk_sprite = sge.gfx.Sprite("snowman_walk", d, origin_x=28,
-                                     origin_y=43, bbox_x=-17, bbox_y=-40,
-                                     bbox_width=34, bbox_height=72)
-snowman_jump_sprite = sge.gfx.Sprite("snowman_jump", d, origin_x=28,
-                                     origin_y=43, bbox_x=-17, bbox_y=-40,
-                                     bbox_width=34, bbox_height=72)
-snowman_hurt_walk_sprite = sge.gfx.Sprite("snowman_hurt_walk", d, origin_x=28,
-                                          origin_y=43, bbox_x=-17, bbox_y=-8,
-                                          bbox_width=34, bbox_height=40)
-snowman_hurt_jump_sprite = sge.gfx.Sprite("snowman_hurt_jump", d, origin_x=28,
-                                          origin_y=43, bbox_x=-17, bbox_y=-8,
-                                          bbox_width=34, bbox_height=40)
-raccot_stand_sprite = sge.gfx.Sprite("raccot_stand", d, origin_x=41,
-                                     origin_y=74, bbox_x=-30, bbox_y=-64,
-                                     bbox_width=60, bbox_height=96)
-raccot_walk_sprite = sge.gfx.Sprite("raccot_walk", d, origin_x=54, origin_y=76,
-                                    bbox_x=-30, bbox_y=-64, bbox_width=60,
-                                    bbox_height=96)
-raccot_stomp_sprite = sge.gfx.Sprite("raccot_stomp", d, origin_x=41,
-                                     origin_y=77, bbox_x=-30, bbox_y=-64,
-                                     bbox_width=60, bbox_height=96)
-raccot_hop_sprite = sge.gfx.Sprite("raccot_hop", d, origin_x=41, origin_y=74,
-                                   bbox_x=-30, bbox_y=-64, bbox_width=60,
-                                   bbox_height=96)
-raccot_jump_sprite = sge.gfx.Sprite("raccot_jump", d, origin_x=60, origin_y=72,
-                                    bbox_x=-30, bbox_y=-64, bbox_width=60,
-                                    bbox_height=96)
-
-d = os.path.join(DATA, "images", "objects", "bonus")
-bonus_empty_sprite = sge.gfx.Sprite("bonus_empty", d)
-bonus_full_sprite = sge.gfx.Sprite("bonus_full", d, fps=8)
-brick_sprite = sge.gfx.Sprite("brick", d)
-brick_shard_sprite = sge.gfx.Sprite("brick_shard", d)
-coin_sprite = sge.gfx.Sprite("coin", d, fps=8)
-fire_flower_sprite = sge.gfx.Sprite("fire_flower", d, origin_x=16, origin_y=16,
-                                    fps=8, bbox_x=-8, bbox_y=-8, bbox_width=16,
-                                    bbox_height=24)
-ice_flower_sprite = sge.gfx.Sprite("ice_flower", d, origin_x=16, origin_y=16,
-                                   fps=4, bbox_x=-8, bbox_y=-8, bbox_width=16,
-                                   bbox_height=24)
-tuxdoll_sprite = sge.gfx.Sprite("tuxdoll", d, origin_x=16, origin_y=16,
-                                bbox_x=-16, bbox_y=-16, bbox_width=32,
-                                bbox_height=32)
-
-tuxdoll_transparent_sprite = tuxdoll_sprite.copy()
-eraser = sge.gfx.Sprite(width=tuxdoll_transparent_sprite.width,
-                        height=tuxdoll_transparent_sprite.height)
-eraser.draw_rectangle(0, 0, eraser.width, eraser.height,
-                      fill=sge.gfx.Color((0, 0, 0, 128)))
-tuxdoll_transparent_sprite.draw_sprite(eraser, 0, 0, 0,
-                                       blend_mode=sge.BLEND_RGBA_SUBTRACT)
-del eraser
-
-tuxdoll_shadow_sprite = tuxdoll_sprite.copy()
-darkener = sge.gfx.Sprite(width=tuxdoll_shadow_sprite.width,
-                          height=tuxdoll_shadow_sprite.height)
-darkener.draw_rectangle(0, 0, darkener.width, darkener.height,
-                        fill=sge.gfx.Color("black"))
-tuxdoll_shadow_sprite.draw_sprite(darkener, 0, 0, 0,
-                                  blend_mode=sge.BLEND_RGB_MINIMUM)
-del darkener
-
-d = os.path.join(DATA, "images", "objects", "decoration")
-lava_body_sprite = sge.gfx.Sprite("lava_body", d, transparent=False, fps=5)
-lava_surface_sprite = sge.gfx.Sprite("lava_surface", d, fps=5)
-goal_sprite = sge.gfx.Sprite("goal", d, fps=8)
-goal_top_sprite = sge.gfx.Sprite("goal_top", d, fps=8)
-
-d = os.path.join(DATA, "images", "objects", "spring")
-fixed_spring_sprite = sge.gfx.Sprite(
+icicle_sprite = load_sprite("icicle", d, bbox_x=0, bbox_y=0, bbox_width=32,
+                            bbox_height=48)
+icicle_broken_sprite = load_sprite("icicle_broken", d, bbox_x=0, bbox_y=32,
+                                   bbox_width=32, bbox_height=16)
+krush_sprite = load_sprite("krush", d, origin_x=1, bbox_x=0, bbox_y=0,
+                           bbox_width=64, bbox_height=64)
+krosh_sprite = load_sprite("krosh", d, origin_x=2, bbox_x=0, bbox_y=0,
+                           bbox_width=128, bbox_height=128)
+circoflame_sprite = load_sprite("circoflame", d, origin_x=16, origin_y=16,
+                                fps=8, bbox_x=-8, bbox_y=-8, bbox_width=16,
+                                bbox_height=16)
+snowman_stand_sprite = load_sprite("snowman_stand", d, origin_x=28,
+                                   origin_y=43, bbox_x=-17, bbox_y=-40,
+                                   bbox_width=34, bbox_height=72)
+snowman_walk_sprite = load_sprite("snowman_walk", d, origin_x=28,
+                                  origin_y=43, bbox_x=-17, bbox_y=-40,
+                                  bbox_width=34, bbox_height=72)
+snowman_jump_sprite = load_sprite("snowman_jump", d, origin_x=28,
+                                  origin_y=43, bbox_x=-17, bbox_y=-40,
+                                  bbox_width=34, bbox_height=72)
+snowman_hurt_walk_sprite = load_sprite("snowman_hurt_walk", d, origin_x=28,
+                                       origin_y=43, bbox_x=-17, bbox_y=-8,
+                                       bbox_width=34, bbox_height=40)
+snowman_hurt_jump_sprite = load_sprite("snowman_hurt_jump", d, origin_x=28,
+                                       origin_y=43, bbox_x=-17, bbox_y=-8,
+                                       bbox_width=34, bbox_height=40)
+raccot_stand_sprite = load_sprite("raccot_stand", d, origin_x=41,
+                                  origin_y=74, bbox_x=-30, bbox_y=-64,
+                                  bbox_width=60, bbox_height=96)
+raccot_walk_sprite = load_sprite("raccot_walk", d, origin_x=54, origin_y=76,
+                                 bbox_x=-30, bbox_y=-64, bbox_width=60,
+                                 bbox_height=96)
+raccot_stomp_sprite = load_sprite("raccot_stomp", d, origin_x=41,
+                                  origin_y=77, bbox_x=-30, bbox_y=-64,
+                                  bbox_width=60, bbox_height=96)
+raccot_hop_sprite = load_sprite("raccot_hop", d, origin_x=41, origin_y=74,
+                                bbox_x=-30, bbox_y=-64, bbox_width=60,
+                                bbox_height=96)
+raccot_jump_sprite = load_sprite("raccot_jump", d, origin_x=60, origin_y=72,
+                                 bbox_x=-30, bbox_y=-64, bbox_width=60,
+                                 bbox_height=96)
+
+d = os.path.join("images", "objects", "bonus")
+bonus_empty_sprite = load_sprite("bonus_empty", d)
+bonus_full_sprite = load_sprite("bonus_full", d, fps=8)
+brick_sprite = load_sprite("brick", d)
+brick_shard_sprite = load_sprite("brick_shard", d)
+coin_sprite = load_sprite("coin", d, fps=8)
+fire_flower_sprite = load_sprite("fire_flower", d, origin_x=16, origin_y=16,
+                                 fps=8, bbox_x=-8, bbox_y=-8, bbox_width=16,
+                                 bbox_height=24)
+ice_flower_sprite = load_sprite("ice_flower", d, origin_x=16, origin_y=16,
+                                fps=4, bbox_x=-8, bbox_y=-8, bbox_width=16,
+                                bbox_height=24)
+tuxdoll_sprite = load_sprite("tuxdoll", d, origin_x=16, origin_y=16,
+                             bbox_x=-16, bbox_y=-16, bbox_width=32,
+                             bbox_height=32)
+
+
+
+def build_blended_sprite(sprite, color, blend_mode):
+    blended = sprite.copy()
+    blender = sge.gfx.Sprite(width=blended.width, height=blended.height)
+    blender.draw_rectangle(0, 0, blender.width, blender.height, fill=color)
+    blended.draw_sprite(blender, 0, 0, 0, blend_mode=blend_mode)
+    return blended
+
+
+tuxdoll_transparent_sprite = cached_sprite(
+    "tuxdoll_transparent", sprite_files(d, "tuxdoll"),
+    lambda: build_blended_sprite(tuxdoll_sprite,
+                                 sge.gfx.Color((0, 0, 0, 128)),
+                                 sge.BLEND_RGBA_SUBTRACT),
+    [(0, 0, 0, 128), sge.BLEND_RGBA_SUBTRACT])
+tuxdoll_shadow_sprite = cached_sprite(
+    "tuxdoll_shadow", sprite_files(d, "tuxdoll"),
+    lambda: build_blended_sprite(tuxdoll_sprite, sge.gfx.Color("black"),
+                                 sge.BLEND_RGB_MINIMUM),
+    ["black", sge.BLEND_RGB_MINIMUM])
+
+d = os.path.join("images", "objects", "decoration")
+lava_body_sprite = load_sprite("lava_body", d, transparent=False, fps=5)
+lava_surface_sprite = load_sprite("lava_surface", d, fps=5)
+goal_sprite = load_sprite("goal", d, fps=8)
+goal_top_sprite = load_sprite("goal_top", d, fps=8)
+
+d = os.path.join("images", "objects", "spring")
+fixed_spring_sprite = load_sprite(
     "fixed_spring", d, origin_x=16, origin_y=16, bbox_x=-16, bbox_y=-7,
     bbox_width=32, bbox_height=23)
-fixed_spring_expand_sprite = sge.gfx.Sprite(
+fixed_spring_expand_sprite = load_sprite(
     "fixed_spring_expand", d, origin_x=16, origin_y=16, fps=16, bbox_x=-16,
     bbox_y=-7, bbox_width=32, bbox_height=23)
-spring_sprite = sge.gfx.Sprite("spring", d, origin_x=16, origin_y=16,
-                               bbox_x=-16, bbox_y=-7, bbox_width=32,
-                               bbox_height=23)
-spring_expand_sprite = sge.gfx.Sprite(
+spring_sprite = load_sprite("spring", d, origin_x=16, origin_y=16,
+                            bbox_x=-16, bbox_y=-7, bbox_width=32,
+                            bbox_height=23)
+spring_expand_sprite = load_sprite(
     "spring_expand", d, origin_x=16, origin_y=16, fps=16, bbox_x=-16,
     bbox_y=-7, bbox_width=32, bbox_height=23)
-rusty_spring_sprite = sge.gfx.Sprite(
+rusty_spring_sprite = load_sprite(
     "rusty_spring", d, origin_x=16, origin_y=16, bbox_x=-16, bbox_y=-7,
     bbox_width=32, bbox_height=23)
-rusty_spring_expand_sprite = sge.gfx.Sprite(
+rusty_spring_expand_sprite = load_sprite(
     "rusty_spring_expand", d, origin_x=16, origin_y=26, fps=16, bbox_x=-16,
     bbox_y=-7, bbox_width=32, bbox_height=23)
-rusty_spring_dead_sprite = sge.gfx.Sprite(
+rusty_spring_dead_sprite = load_sprite(
     "rusty_spring_dead", d, origin_x=16, origin_y=26, bbox_x=-16, bbox_y=-7,
     bbox_width=32, bbox_height=23)
 
-d = os.path.join(DATA, "images", "objects", "misc")
-platform_sprite = sge.gfx.Sprite("platform", d)
-rock_sprite = sge.gfx.Sprite("rock", d)
-lantern_sprite = sge.gfx.Sprite("lantern", d, origin_x=20, origin_y=9, fps=10,
-                                bbox_x=-16, bbox_y=0, bbox_width=32,
-                                bbox_height=32)
-iceblock_sprite = sge.gfx.Sprite("iceblock", d)
-iceblock_melt_sprite = sge.gfx.Sprite("iceblock_melt", d, fps=30)
-thin_ice_sprite = sge.gfx.Sprite("thin_ice", d, fps=0)
-thin_ice_break_sprite = sge.gfx.Sprite("thin_ice_break", d, fps=8)
-boss_block_sprite = sge.gfx.Sprite("boss_block", d, transparent=False,
-                                   origin_x=16, origin_y=16)
-bell_sprite = sge.gfx.Sprite("bell", d, origin_x=-1, fps=10, bbox_x=0,
-                             bbox_width=32, bbox_height=32)
-door_sprite = sge.gfx.Sprite("door", d, origin_x=25, origin_y=68, fps=10)
-door_back_sprite = sge.gfx.Sprite("door_back", d, origin_x=21, origin_y=41,
-                                  transparent=False)
-
-d = os.path.join(DATA, "images", "portraits")
+d = os.path.join("images", "objects", "misc")
+platform_sprite = load_sprite("platform", d)
+rock_sprite = load_sprite("rock", d)
+lantern_sprite = load_sprite("lantern", d, origin_x=20, origin_y=9, fps=10,
+                             bbox_x=-16, bbox_y=0, bbox_width=32,
+                             bbox_height=32)
+iceblock_sprite = load_sprite("iceblock", d)
+iceblock_melt_sprite = load_sprite("iceblock_melt", d, fps=30)
+thin_ice_sprite = load_sprite("thin_ice", d, fps=0)
+thin_ice_break_sprite = load_sprite("thin_ice_break", d, fps=8)
+boss_block_sprite = load_sprite("boss_block", d, transparent=False,
+                                origin_x=16, origin_y=16)
+bell_sprite = load_sprite("bell", d, origin_x=-1, fps=10, bbox_x=0,
+                          bbox_width=32, bbox_height=32)
+door_sprite = load_sprite("door", d, origin_x=25, origin_y=68, fps=10)
+door_back_sprite = load_sprite("door_back", d, origin_x=21, origin_y=41,
+                               transparent=False)
+
+d = os.path.join("images", "portraits")
 portrait_sprites = {}
-for fname in os.listdir(d):
+for fname in data_listdir(d):
     root, ext = os.path.splitext(fname)
     try:
-        portrait = sge.gfx.Sprite(root, d)
+        portrait = load_sprite(root, d)
     except OSError:
         pass
     else:
         portrait_sprites[root] = portrait
 
-d = os.path.join(DATA, "images", "misc")
-logo_sprite = sge.gfx.Sprite("logo", d, origin_x=140)
-fire_bullet_sprite = sge.gfx.Sprite("fire_bullet", d, origin_x=8, origin_y=8,
-                                    fps=8, bbox_x=-8, bbox_width=16)
-ice_bullet_sprite = sge.gfx.Sprite("ice_bullet", d, origin_x=8, origin_y=7,
-                                   bbox_width=32)
-ice_bullet_break_sprite = sge.gfx.Sprite("ice_bullet_break", d, origin_x=8,
-                                         origin_y=7, fps=24)
-explosion_sprite = sge.gfx.Sprite("explosion", d, origin_x=32, origin_y=19,
-                                  fps=15, bbox_x=-28, bbox_y=-11,
-                                  bbox_width=56, bbox_height=48)
-smoke_puff_sprite = sge.gfx.Sprite("smoke_puff", d, width=48, height=48,
-                                   origin_x=24, origin_y=24, fps=24)
-smoke_plume_sprite = sge.gfx.Sprite("smoke_plume", d, width=64, height=64,
-                                    origin_x=32, origin_y=32, fps=30)
-fireball_smoke_sprite = sge.gfx.Sprite("smoke_plume", d, width=16, height=16,
-                                       origin_x=8, origin_y=8, fps=30)
-item_spawn_cloud_sprite = sge.gfx.Sprite("smoke_plume", d, width=80, height=80,
-                                         origin_x=40, origin_y=40, fps=30)
+d = os.path.join("images", "misc")
+logo_sprite = load_sprite("logo", d, origin_x=140)
+fire_bullet_sprite = load_sprite("fire_bullet", d, origin_x=8, origin_y=8,
+                                 fps=8, bbox_x=-8, bbox_width=16)
+ice_bullet_sprite = load_sprite("ice_bullet", d, origin_x=8, origin_y=7,
+                                bbox_width=32)
+ice_bullet_break_sprite = load_sprite("ice_bullet_break", d, origin_x=8,
+                                      origin_y=7, fps=24)
+explosion_sprite = load_sprite("explosion", d, origin_x=32, origin_y=19,
+                               fps=15, bbox_x=-28, bbox_y=-11,
+                               bbox_width=56, bbox_height=48)
+smoke_puff_sprite = load_sprite("smoke_puff", d, width=48, height=48,
+                                origin_x=24, origin_y=24, fps=24)
+smoke_plume_sprite = load_sprite("smoke_plume", d, width=64, height=64,
+                                 origin_x=32, origin_y=32, fps=30)
+fireball_smoke_sprite = load_sprite("smoke_plume", d, width=16, height=16,
+                                    origin_x=8, origin_y=8, fps=30)
+item_spawn_cloud_sprite = load_sprite("smoke_plume", d, width=80, height=80,
+                                      origin_x=40, origin_y=40, fps=30)
 item_spawn_cloud_sprite.delete_frame(0)
-light_sprite = sge.gfx.Sprite("light", d, origin_x=192, origin_y=192)
-light_small_sprite = sge.gfx.Sprite("light_small", d, origin_x=64, origin_y=64)
-light_tiny_sprite = sge.gfx.Sprite("light_tiny", d, origin_x=32, origin_y=32)
-heart_empty_sprite = sge.gfx.Sprite("heart_empty", d, origin_y=-1)
-heart_full_sprite = sge.gfx.Sprite("heart_full", d, origin_y=-1)
-
-fire_flower_light_sprite = light_small_sprite.copy()
-blender = sge.gfx.Sprite(width=fire_flower_light_sprite.width,
-                         height=fire_flower_light_sprite.height)
-blender.draw_rectangle(0, 0, blender.width, blender.height,
-                       fill=sge.gfx.Color("#F1670B"))
-fire_flower_light_sprite.draw_sprite(blender, 0, 0, 0,
-                                     blend_mode=sge.BLEND_RGB_MULTIPLY)
-del blender
-
-ice_flower_light_sprite = light_small_sprite.copy()
-blender = sge.gfx.Sprite(width=ice_flower_light_sprite.width,
-                         height=ice_flower_light_sprite.height)
-blender.draw_rectangle(0, 0, blender.width, blender.height,
-                       fill=sge.gfx.Color("#7CF8FA"))
-ice_flower_light_sprite.draw_sprite(blender, 0, 0, 0,
-                                    blend_mode=sge.BLEND_RGB_MULTIPLY)
-del blender
-
-fireball_light_sprite = light_tiny_sprite.copy()
-blender = sge.gfx.Sprite(width=fireball_light_sprite.width,
-                         height=fireball_light_sprite.height)
-blender.draw_rectangle(0, 0, blender.width, blender.height,
-                       fill=sge.gfx.Color("#FF5B11"))
-fireball_light_sprite.draw_sprite(blender, 0, 0, 0,
-                                  blend_mode=sge.BLEND_RGB_MULTIPLY)
-del blender
-
-explosion_light_sprite = light_small_sprite.copy()
-blender = sge.gfx.Sprite(width=fire_flower_light_sprite.width,
-                         height=fire_flower_light_sprite.height)
-blender.draw_rectangle(0, 0, blender.width, blender.height,
-                       fill=sge.gfx.Color("#FFBC00"))
-explosion_light_sprite.draw_sprite(blender, 0, 0, 0,
-                                   blend_mode=sge.BLEND_RGB_MULTIPLY)
-del blender
-
-circoflame_light_sprite = light_tiny_sprite.copy()
-blender = sge.gfx.Sprite(width=fireball_light_sprite.width,
-                         height=fireball_light_sprite.height)
-blender.draw_rectangle(0, 0, blender.width, blender.height,
-                       fill=sge.gfx.Color("#D5CD49"))
-circoflame_light_sprite.draw_sprite(blender, 0, 0, 0,
-                                    blend_mode=sge.BLEND_RGB_MULTIPLY)
-del blender
+light_sprite = load_sprite("light", d, origin_x=192, origin_y=192)
+light_small_sprite = load_sprite("light_small", d, origin_x=64, origin_y=64)
+light_tiny_sprite = load_sprite("light_tiny", d, origin_x=32, origin_y=32)
+heart_empty_sprite = load_sprite("heart_empty", d, origin_y=-1)
+heart_full_sprite = load_sprite("heart_full", d, origin_y=-1)
+
+light_sprites = {}
+for name, base, color in [
+        ("fire_flower_light", "light_small", "#F1670B"),
+        ("ice_flower_light", "light_small", "#7CF8FA"),
+        ("fireball_light", "light_tiny", "#FF5B11"),
+        ("explosion_light", "light_small", "#FFBC00"),
+        ("circoflame_light", "light_tiny", "#D5CD49")]:
+    base_sprite = (light_small_sprite if base == "light_small"
+                   else light_tiny_sprite)
+    light_sprites[name] = cached_sprite(
+        name, sprite_files(d, base),
+        lambda: build_blended_sprite(base_sprite, sge.gfx.Color(color),
+                                     sge.BLEND_RGB_MULTIPLY),
+        [color, sge.BLEND_RGB_MULTIPLY])
+
+fire_flower_light_sprite = light_sprites["fire_flower_light"]
+ice_flower_light_sprite = light_sprites["ice_flower_light"]
+fireball_light_sprite = light_sprites["fireball_light"]
+explosion_light_sprite = light_sprites["explosion_light"]
+circoflame_light_sprite = light_sprites["circoflame_light"]
+del light_sprites
 
 coin_icon_sprite = coin_sprite.copy()
 coin_icon_sprite.width = 16
 coin_icon_sprite.height = 16
 coin_icon_sprite.origin_y = -1
 
-d = os.path.join(DATA, "images", "worldmap")
-worldmap_tux_sprite = sge.gfx.Sprite(
+d = os.path.join("images", "worldmap")
+worldmap_tux_sprite = load_sprite(
     "tux", d, origin_x=1, origin_y=12, bbox_x=0, bbox_y=0, bbox_width=32,
     bbox_height=32)
-worldmap_tux_walk_sprite = sge.gfx.Sprite(
+worldmap_tux_walk_sprite = load_sprite(
     "tux_walk", d, origin_x=1, origin_y=12, fps=16, bbox_x=0, bbox_y=0,
     bbox_width=32, bbox_height=32)
-worldmap_level_complete_sprite = sge.gfx.Sprite("level_complete", d)
-worldmap_level_incomplete_sprite = sge.gfx.Sprite("level_incomplete", d, fps=8)
-worldmap_warp_sprite = sge.gfx.Sprite("warp", d, fps=3)
-worldmap_water_sprite = sge.gfx.Sprite("water", d, transparent=False, fps=8)
+worldmap_level_complete_sprite = load_sprite("level_complete", d)
+worldmap_level_incomplete_sprite = load_sprite("level_incomplete", d, fps=8)
+worldmap_warp_sprite = load_sprite("warp", d, fps=3)
+worldmap_water_sprite = load_sprite("water", d, transparent=False, fps=8)
 
 # Load backgrounds
-d = os.path.join(DATA, "images", "backgrounds")
-layers = []
-
-if not NO_BACKGROUNDS:
-    layers = [
-        sge.gfx.BackgroundLayer(
-            sge.gfx.Sprite("arctis1-middle", d), 0, 0, -100000,
-            xscroll_rate=0.5, yscroll_rate=0.5, repeat_left=True,
-            repeat_right=True),
-        sge.gfx.BackgroundLayer(
-            sge.gfx.Sprite("arctis1-bottom", d, transparent=False), 0, 352,
-            -100000, xscroll_rate=0.5, yscroll_rate=0.5, repeat_left=True,
-            repeat_right=True, repeat_down=True),
-        sge.gfx.BackgroundLayer(
-            sge.gfx.Sprite("arctis2-middle", d), 0, 0, -100010,
-            xscroll_rate=0.25, yscroll_rate=0.25, repeat_left=True,
-            repeat_right=True),
-        sge.gfx.BackgroundLayer(
-            sge.gfx.Sprite("arctis2-bottom", d, transparent=False), 0, 352,
-            -100010, xscroll_rate=0.25, yscroll_rate=0.25, repeat_left=True,
-            repeat_right=True, repeat_down=True),
-        sge.gfx.BackgroundLayer(
-            sge.gfx.Sprite("arctis3", d, transparent=False), 0, 0, -100020,
-            xscroll_rate=0, yscroll_rate=0, repeat_left=True,
-            repeat_right=True)]
-
-backgrounds["arctis"] = sge.gfx.Background(layers,
-                                           sge.gfx.Color((109, 92, 230)))
-
-if not NO_BACKGROUNDS:
-    cave_edge_spr = sge.gfx.Sprite("cave-edge", d, transparent=False)
-    layers = [
-        sge.gfx.BackgroundLayer(
-            sge.gfx.Sprite("cave-middle", d, transparent=False), 0, 128,
-            -100000, xscroll_rate=0.7, yscroll_rate=0.7, repeat_left=True,
-            repeat_right=True),
-        sge.gfx.BackgroundLayer(
-            cave_edge_spr, 0, 0, -100000, xscroll_rate=0.7, yscroll_rate=0.7,
-            repeat_left=True, repeat_right=True, repeat_up=True),
-        sge.gfx.BackgroundLayer(
-            cave_edge_spr, 0, 256, -100000, xscroll_rate=0.7, yscroll_rate=0.7,
-            repeat_left=True, repeat_right=True, repeat_down=True)]
-    del cave_edge_spr
-
-backgrounds["cave"] = sge.gfx.Background(layers, sge.gfx.Color("#024"))
-
-if not NO_BACKGROUNDS:
-    nightsky_bottom_spr = sge.gfx.Sprite("nightsky-bottom", d,
-                                         transparent=False)
-    layers = [
-        sge.gfx.BackgroundLayer(
-            sge.gfx.Sprite("nightsky1-middle", d), 0, 306, -100000,
-            xscroll_rate=0.5, yscroll_rate=0.5, repeat_left=True,
-            repeat_right=True),
-        sge.gfx.BackgroundLayer(
-            nightsky_bottom_spr, 0, 664, -100000, xscroll_rate=0.5,
-            yscroll_rate=0.5, repeat_left=True, repeat_right=True,
-            repeat_down=True),
-        sge.gfx.BackgroundLayer(
-            sge.gfx.Sprite("nightsky2-middle", d, transparent=False), 0, 0,
-            -100010, xscroll_rate=0.25, yscroll_rate=0.25, repeat_left=True,
-            repeat_right=True),
-        sge.gfx.BackgroundLayer(
-            sge.gfx.Sprite("nightsky2-top", d, transparent=False), 0, -600,
-            -100010, xscroll_rate=0.25, yscroll_rate=0.25, repeat_left=True,
-            repeat_right=True, repeat_up=True),
-        sge.gfx.BackgroundLayer(
-            nightsky_bottom_spr, 0, 600, -100010, xscroll_rate=0.25,
-            yscroll_rate=0.25, repeat_left=True, repeat_right=True,
-            repeat_down=True)]
-    del nightsky_bottom_spr
-
-backgrounds["nightsky"] = sge.gfx.Background(layers, sge.gfx.Color("#002"))
-
-if not NO_BACKGROUNDS:
-    layers = [
-        sge.gfx.BackgroundLayer(
-            sge.gfx.Sprite("bluemountain-middle", d, transparent=False), 0,
-            -128, -100000, xscroll_rate=0.1, yscroll_rate=0.1,
-            repeat_left=True, repeat_right=True),
-        sge.gfx.BackgroundLayer(
-            sge.gfx.Sprite("bluemountain-top", d, transparent=False), 0, -704,
-            -100000, xscroll_rate=0.1, yscroll_rate=0.1, repeat_left=True,
-            repeat_right=True, repeat_up=True),
-        sge.gfx.BackgroundLayer(
-            sge.gfx.Sprite("bluemountain-bottom", d, transparent=False), 0,
-            448, -100000, xscroll_rate=0.1, yscroll_rate=0.1, repeat_left=True,
-            repeat_right=True, repeat_down=True)]
-
-backgrounds["bluemountain"] = sge.gfx.Background(layers,
-                                                 sge.gfx.Color((86, 142, 206)))
-
-if not NO_BACKGROUNDS:
-    layers = [
-        sge.gfx.BackgroundLayer(
-            sge.gfx.Sprite("snowmountains", d), 0, 0, -100000,
-            xscroll_rate=0.25, yscroll_rate=0, repeat_left=True,
-            repeat_right=True),
-        sge.gfx.BackgroundLayer(
-            sge.gfx.Sprite("snowmountains-bottom", d, transparent=False), 0,
-            720, -100000, xscroll_rate=0.25, yscroll_rate=0, repeat_left=True,
-            repeat_right=True, repeat_down=True),
-        sge.gfx.BackgroundLayer(
-            sge.gfx.Sprite("snowmountains-sky", d, transparent=False), 0, 0,
-            -100010, xscroll_rate=0, yscroll_rate=0, repeat_left=True,
-            repeat_right=True)]
-
-backgrounds["snowmountains"] = sge.gfx.Background(layers,
-                                                  sge.gfx.Color("#DAD8F5"))
-
-if not NO_BACKGROUNDS:
-    layers = [
-        sge.gfx.BackgroundLayer(
-            sge.gfx.Sprite("cloud-mountains-midground", d), 0, -366, -100010,
-            xscroll_rate=0.25, yscroll_rate=0.1, repeat_left=True,
-            repeat_right=True),
-        sge.gfx.BackgroundLayer(
-            sge.gfx.Sprite("cloud-mountains-bottom", d), 0, 723, -100000,
-            xscroll_rate=0.25, yscroll_rate=0.1, repeat_left=True,
-            repeat_right=True, repeat_down=True),
-        sge.gfx.BackgroundLayer(
-            sge.gfx.Sprite("cloud-mountains-foreground", d), 0, -366, -100000,
-            xscroll_rate=0.2, yscroll_rate=0.1, repeat_left=True,
-            repeat_right=True),
-        sge.gfx.BackgroundLayer(
-            sge.gfx.Sprite("cloud-mountains-background", d), 0, -366, -100020,
-            xscroll_rate=0.1, yscroll_rate=0.1, repeat_left=True,
-            repeat_right=True)]
-
-backgrounds["cloudmountains"] = sge.gfx.Background(layers,
-                                                   sge.gfx.Color("#769094"))
-
-castle_spr = sge.gfx.Sprite("castle", d)
-castle_bottom_spr = sge.gfx.Sprite("castle-bottom", d, transparent=False)
-for i in list(backgrounds.keys()):
+def build_arctis_background():
+    d = os.path.join("images", "backgrounds")
+    layers = []
     if not NO_BACKGROUNDS:
-        layers = backgrounds[i].layers + [
-            sge.gfx.BackgroundLayer(castle_spr, 0, -64, -99000,
-                                    xscroll_rate=0.75, yscroll_rate=1,
-                                    repeat_left=True, repeat_right=True,
-                                    repeat_up=True),
-            sge.gfx.BackgroundLayer(castle_bottom_spr, 0, 544, -99000,
-                                    xscroll_rate=0.75, yscroll_rate=1,
-                                    repeat_left=True, repeat_right=True,
-                                    repeat_down=True)]
-
-        backgrounds["{}_castle".format(i)] = sge.gfx.Background(
-            layers, backgrounds[i].color)
-    else:
-        backgrounds["{}_castle".format(i)] = sge.gfx.Background(
-            [], sge.gfx.Color("#221833"))
-del castle_spr
-del castle_bottom_spr
+        layers = [
+            sge.gfx.BackgroundLayer(
+                load_sprite("arctis1-middle", d), 0, 0, -100000,
+                xscroll_rate=0.5, yscroll_rate=0.5, repeat_left=True,
+                repeat_right=True),
+            sge.gfx.BackgroundLayer(
+                load_sprite("arctis1-bottom", d, transparent=False), 0, 352,
+                -100000, xscroll_rate=0.5, yscroll_rate=0.5, repeat_left=True,
+                repeat_right=True, repeat_down=True),
+            sge.gfx.BackgroundLayer(
+                load_sprite("arctis2-middle", d), 0, 0, -100010,
+                xscroll_rate=0.25, yscroll_rate=0.25, repeat_left=True,
+                repeat_right=True),
+            sge.gfx.BackgroundLayer(
+                load_sprite("arctis2-bottom", d, transparent=False), 0, 352,
+                -100010, xscroll_rate=0.25, yscroll_rate=0.25,
+                repeat_left=True, repeat_right=True, repeat_down=True),
+            sge.gfx.BackgroundLayer(
+                load_sprite("arctis3", d, transparent=False), 0, 0, -100020,
+                xscroll_rate=0, yscroll_rate=0, repeat_left=True,
+                repeat_right=True)]
+
+    return sge.gfx.Background(layers, sge.gfx.Color((109, 92, 230)))
+
+
+def build_cave_background():
+    d = os.path.join("images", "backgrounds")
+    layers = []
+    if not NO_BACKGROUNDS:
+        cave_edge_spr = load_sprite("cave-edge", d, transparent=False)
+        layers = [
+            sge.gfx.BackgroundLayer(
+                load_sprite("cave-middle", d, transparent=False), 0, 128,
+                -100000, xscroll_rate=0.7, yscroll_rate=0.7, repeat_left=True,
+                repeat_right=True),
+            sge.gfx.BackgroundLayer(
+                cave_edge_spr, 0, 0, -100000, xscroll_rate=0.7,
+                yscroll_rate=0.7, repeat_left=True, repeat_right=True,
+                repeat_up=True),
+            sge.gfx.BackgroundLayer(
+                cave_edge_spr, 0, 256, -100000, xscroll_rate=0.7,
+                yscroll_rate=0.7, repeat_left=True, repeat_right=True,
+                repeat_down=True)]
+
+    return sge.gfx.Background(layers, sge.gfx.Color("#024"))
+
+
+def build_nightsky_background():
+    d = os.path.join("images", "backgrounds")
+    layers = []
+    if not NO_BACKGROUNDS:
+        nightsky_bottom_spr = load_sprite("nightsky-bottom", d,
+                                          transparent=False)
+        layers = [
+            sge.gfx.BackgroundLayer(
+                load_sprite("nightsky1-middle", d), 0, 306, -100000,
+                xscroll_rate=0.5, yscroll_rate=0.5, repeat_left=True,
+                repeat_right=True),
+            sge.gfx.BackgroundLayer(
+                nightsky_bottom_spr, 0, 664, -100000, xscroll_rate=0.5,
+                yscroll_rate=0.5, repeat_left=True, repeat_right=True,
+                repeat_down=True),
+            sge.gfx.BackgroundLayer(
+                load_sprite("nightsky2-middle", d, transparent=False), 0, 0,
+                -100010, xscroll_rate=0.25, yscroll_rate=0.25,
+                repeat_left=True, repeat_right=True),
+            sge.gfx.BackgroundLayer(
+                load_sprite("nightsky2-top", d, transparent=False), 0, -600,
+                -100010, xscroll_rate=0.25, yscroll_rate=0.25,
+                repeat_left=True, repeat_right=True, repeat_up=True),
+            sge.gfx.BackgroundLayer(
+                nightsky_bottom_spr, 0, 600, -100010, xscroll_rate=0.25,
+                yscroll_rate=0.25, repeat_left=True, repeat_right=True,
+                repeat_down=True)]
+
+    return sge.gfx.Background(layers, sge.gfx.Color("#002"))
+
+
+def build_bluemountain_background():
+    d = os.path.join("images", "backgrounds")
+    layers = []
+    if not NO_BACKGROUNDS:
+        layers = [
+            sge.gfx.BackgroundLayer(
+                load_sprite("bluemountain-middle", d, transparent=False), 0,
+                -128, -100000, xscroll_rate=0.1, yscroll_rate=0.1,
+                repeat_left=True, repeat_right=True),
+            sge.gfx.BackgroundLayer(
+                load_sprite("bluemountain-top", d, transparent=False), 0,
+                -704, -100000, xscroll_rate=0.1, yscroll_rate=0.1,
+                repeat_left=True, repeat_right=True, repeat_up=True),
+            sge.gfx.BackgroundLayer(
+                load_sprite("bluemountain-bottom", d, transparent=False), 0,
+                448, -100000, xscroll_rate=0.1, yscroll_rate=0.1,
+                repeat_left=True, repeat_right=True, repeat_down=True)]
+
+    return sge.gfx.Background(layers, sge.gfx.Color((86, 142, 206)))
+
+
+def build_snowmountains_background():
+    d = os.path.join("images", "backgrounds")
+    layers = []
+    if not NO_BACKGROUNDS:
+        layers = [
+            sge.gfx.BackgroundLayer(
+                load_sprite("snowmountains", d), 0, 0, -100000,
+                xscroll_rate=0.25, yscroll_rate=0, repeat_left=True,
+                repeat_right=True),
+            sge.gfx.BackgroundLayer(
+                load_sprite("snowmountains-bottom", d, transparent=False), 0,
+                720, -100000, xscroll_rate=0.25, yscroll_rate=0,
+                repeat_left=True, repeat_right=True, repeat_down=True),
+            sge.gfx.BackgroundLayer(
+                load_sprite("snowmountains-sky", d, transparent=False), 0, 0,
+                -100010, xscroll_rate=0, yscroll_rate=0, repeat_left=True,
+                repeat_right=True)]
+
+    return sge.gfx.Background(layers, sge.gfx.Color("#DAD8F5"))
+
+
+def build_cloudmountains_background():
+    d = os.path.join("images", "backgrounds")
+    layers = []
+    if not NO_BACKGROUNDS:
+        layers = [
+            sge.gfx.BackgroundLayer(
+                load_sprite("cloud-mountains-midground", d), 0, -366, -100010,
+                xscroll_rate=0.25, yscroll_rate=0.1, repeat_left=True,
+                repeat_right=True),
+            sge.gfx.BackgroundLayer(
+                load_sprite("cloud-mountains-bottom", d), 0, 723, -100000,
+                xscroll_rate=0.25, yscroll_rate=0.1, repeat_left=True,
+                repeat_right=True, repeat_down=True),
+            sge.gfx.BackgroundLayer(
+                load_sprite("cloud-mountains-foreground", d), 0, -366,
+                -100000, xscroll_rate=0.2, yscroll_rate=0.1, repeat_left=True,
+                repeat_right=True),
+            sge.gfx.BackgroundLayer(
+                load_sprite("cloud-mountains-background", d), 0, -366,
+                -100020, xscroll_rate=0.1, yscroll_rate=0.1, repeat_left=True,
+                repeat_right=True)]
+
+    return sge.gfx.Background(layers, sge.gfx.Color("#769094"))
+
+
+def build_castle_background(base):
+    if NO_BACKGROUNDS:
+        return sge.gfx.Background([], sge.gfx.Color("#221833"))
+
+    # Share the base background's layers if it's already loaded.
+    background = backgrounds.get(base) or background_builders[base]()
+    d = os.path.join("images", "backgrounds")
+    castle_spr = load_sprite("castle", d)
+    castle_bottom_spr = load_sprite("castle-bottom", d, transparent=False)
+    layers = background.layers + [
+        sge.gfx.BackgroundLayer(castle_spr, 0, -64, -99000,
+                                xscroll_rate=0.75, yscroll_rate=1,
+                                repeat_left=True, repeat_right=True,
+                                repeat_up=True),
+        sge.gfx.BackgroundLayer(castle_bottom_spr, 0, 544, -99000,
+                                xscroll_rate=0.75, yscroll_rate=1,
+                                repeat_left=True, repeat_right=True,
+                                repeat_down=True)]
+
+    return sge.gfx.Background(layers, background.color)
+
+
+background_builders["arctis"] = build_arctis_background
+background_builders["cave"] = build_cave_background
+background_builders["nightsky"] = build_nightsky_background
+background_builders["bluemountain"] = build_bluemountain_background
+background_builders["snowmountains"] = build_snowmountains_background
+background_builders["cloudmountains"] = build_cloudmountains_background
+for i in list(background_builders.keys()):
+    background_builders["{}_castle".format(i)] = (
+        lambda base=i: build_castle_background(base))
 
 # Load fonts
 print(_("Loading fonts..."))
@@ -8516,84 +10261,80 @@ chars = ([None] + [chr(i) for i in range(33, 127)] + ['\u2190', ' ']
 #/ font file to be used instead of the default sprite font. If the
 #/ sprite font is sufficient, leave this as-is.
 if _("font_file") == "font_file":
-    font_sprite = sge.gfx.Sprite.from_tileset(
-        os.path.join(DATA, "images", "misc", "font.png"), columns=16, rows=20,
-        width=16, height=18)
+    def load_font_sprite(name, width, height):
+        rel = os.path.join("images", "misc", "{}.png".format(name))
+        return cached_sprite(
+            name, [rel],
+            lambda: sge.gfx.Sprite.from_tileset(
+                data_path(rel), columns=16, rows=20, width=width,
+                height=height),
+            [16, 20, width, height])
+
+    font_sprite = load_font_sprite("font", 16, 18)
     font = sge.gfx.Font.from_sprite(font_sprite, chars, size=18)
 
-    font_small_sprite = sge.gfx.Sprite.from_tileset(
-        os.path.join(DATA, "images", "misc", "font_small.png"), columns=16,
-        rows=20, width=8, height=9)
+    font_small_sprite = load_font_sprite("font_small", 8, 9)
     font_small = sge.gfx.Font.from_sprite(font_small_sprite, chars, size=9)
 
-    font_big_sprite = sge.gfx.Sprite.from_tileset(
-        os.path.join(DATA, "images", "misc", "font_big.png"), columns=16,
-        rows=20, width=20, height=22)
+    font_big_sprite = load_font_sprite("font_big", 20, 22)
     font_big = sge.gfx.Font.from_sprite(font_big_sprite, chars, size=22)
 else:
     text_outline_thickness = 1
-    fname = os.path.join(DATA, "fonts", _("font_file"))
+    fname = data_path("fonts", _("font_file"))
     font = sge.gfx.Font(fname, size=18)
     font_small = sge.gfx.Font(fname, size=9)
     font_big = sge.gfx.Font(fname, size=22)
     del fname
 
 # Load sounds
-jump_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "jump.wav"))
-bigjump_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "bigjump.wav"))
-skid_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "skid.wav"))
-hurt_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "hurt.wav"))
-kill_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "kill.wav"))
-brick_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "brick.wav"))
-coin_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "coin.wav"))
-find_powerup_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "upgrade.wav"))
-tuxdoll_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "tuxdoll.wav"))
-s = sge.snd.Sound(os.path.join(DATA, "sounds", "ice_crack-0.wav"))
+jump_sound = LazySound("jump.wav")
+bigjump_sound = LazySound("bigjump.wav")
+skid_sound = LazySound("skid.wav")
+hurt_sound = LazySound("hurt.wav")
+kill_sound = LazySound("kill.wav")
+brick_sound = LazySound("brick.wav")
+coin_sound = LazySound("coin.wav")
+find_powerup_sound = LazySound("upgrade.wav")
+tuxdoll_sound = LazySound("tuxdoll.wav")
+s = LazySound("ice_crack-0.wav")
 ice_crack_sounds = [
     s,
-    sge.snd.Sound(os.path.join(DATA, "sounds", "ice_crack-1.wav"), parent=s),
-    sge.snd.Sound(os.path.join(DATA, "sounds", "ice_crack-2.wav"), parent=s),
-    sge.snd.Sound(os.path.join(DATA, "sounds", "ice_crack-3.wav"), parent=s)]
-ice_shatter_sound = sge.snd.Sound(os.path.join(DATA, "sounds",
-                                               "ice_shatter.wav"))
-heal_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "heal.wav"))
-shoot_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "shoot.wav"))
-fire_dissipate_sound = sge.snd.Sound(os.path.join(DATA, "sounds",
-                                                  "fire_dissipate.wav"))
-icebullet_break_sound = sge.snd.Sound(os.path.join(DATA, "sounds",
-                                                   "icebullet_break.wav"))
-squish_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "squish.wav"))
-stomp_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "stomp.wav"))
-sizzle_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "sizzle.ogg"))
-spring_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "spring.wav"))
-rusty_spring_sound = sge.snd.Sound(os.path.join(DATA, "sounds",
-                                                "rusty_spring.wav"))
-kick_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "kick.wav"))
-iceblock_bump_sound = sge.snd.Sound(os.path.join(DATA, "sounds",
-                                                 "iceblock_bump.wav"))
-icicle_shake_sound = sge.snd.Sound(os.path.join(DATA, "sounds",
-                                                "icicle_shake.wav"))
-icicle_crash_sound = sge.snd.Sound(os.path.join(DATA, "sounds",
-                                                "icicle_crash.wav"))
-explosion_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "explosion.wav"))
-fall_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "fall.wav"))
-yeti_gna_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "yeti_gna.wav"))
-yeti_roar_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "yeti_roar.wav"))
-pop_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "pop.wav"))
-bell_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "bell.wav"))
-pipe_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "pipe.ogg"))
-warp_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "warp.wav"))
-door_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "door.wav"))
-door_shut_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "door_shut.wav"))
-pause_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "select.ogg"))
-select_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "select.ogg"))
+    LazySound("ice_crack-1.wav", parent=s),
+    LazySound("ice_crack-2.wav", parent=s),
+    LazySound("ice_crack-3.wav", parent=s)]
+ice_shatter_sound = LazySound("ice_shatter.wav")
+heal_sound = LazySound("heal.wav")
+shoot_sound = LazySound("shoot.wav")
+fire_dissipate_sound = LazySound("fire_dissipate.wav")
+icebullet_break_sound = LazySound("icebullet_break.wav")
+squish_sound = LazySound("squish.wav")
+stomp_sound = LazySound("stomp.wav")
+sizzle_sound = LazySound("sizzle.ogg")
+spring_sound = LazySound("spring.wav")
+rusty_spring_sound = LazySound("rusty_spring.wav")
+kick_sound = LazySound("kick.wav")
+iceblock_bump_sound = LazySound("iceblock_bump.wav")
+icicle_shake_sound = LazySound("icicle_shake.wav")
+icicle_crash_sound = LazySound("icicle_crash.wav")
+explosion_sound = LazySound("explosion.wav")
+fall_sound = LazySound("fall.wav")
+yeti_gna_sound = LazySound("yeti_gna.wav")
+yeti_roar_sound = LazySound("yeti_roar.wav")
+pop_sound = LazySound("pop.wav")
+bell_sound = LazySound("bell.wav")
+pipe_sound = LazySound("pipe.ogg")
+warp_sound = LazySound("warp.wav")
+door_sound = LazySound("door.wav")
+door_shut_sound = LazySound("door_shut.wav")
+pause_sound = LazySound("select.ogg")
+select_sound = LazySound("select.ogg")
 confirm_sound = coin_sound
 cancel_sound = pop_sound
 error_sound = hurt_sound
-type_sound = sge.snd.Sound(os.path.join(DATA, "sounds", "type.wav"))
+type_sound = LazySound("type.wav")
 
 # Load music
-level_win_music = sge.snd.Music(os.path.join(DATA, "music", "leveldone.ogg"))
+level_win_music = sge.snd.Music(data_path("music", "leveldone.ogg"))
 loaded_music["leveldone.ogg"] = level_win_music
 
 # Create objects
@@ -8615,6 +10356,22 @@ elif RECORD:
     sge.game.start_room = LevelRecorder.load(RECORD, True)
     if sge.game.start_room is None:
         sys.exit()
+elif REPLAY:
+    try:
+        level, recording, length = load_recording(REPLAY)
+    except (OSError, ValueError, IndexError, KeyError, struct.error) as e:
+        show_error(_("An error occurred when trying to load the "
+                     "recording:\n\n{}").format(e))
+        sys.exit()
+    sge.game.start_room = LevelReplayer.load(level, True)
+    if sge.game.start_room is None:
+        sys.exit()
+    sge.game.start_room.replay = recording
+    if length is None and HEADLESS:
+        # Without a length, stop once the last recorded input is in.
+        length = max([inputs[-1][0] + 1 for inputs in recording.values()
+                      if inputs] or [0])
+    sge.game.start_room.replay_length = length
 else:
     sge.game.start_room = TitleScreen.load(
         os.path.join("special", "title_screen.json"), True)
@@ -8657,6 +10414,7 @@ finally:
     music_volume = cfg.get("music_volume", music_volume)
     stereo_enabled = cfg.get("stereo_enabled", stereo_enabled)
     fps_enabled = cfg.get("fps_enabled", fps_enabled)
+    preload_memory = cfg.get("preload_memory", preload_memory)
     joystick_threshold = cfg.get("joystick_threshold", joystick_threshold)
     xsge_gui.joystick_threshold = joystick_threshold
 
@@ -8742,12 +10500,25 @@ else:
 if __name__ == '__main__':
     print(_("Starting game..."))
 
-    if HAVE_TK:
+    if HAVE_TK and not HEADLESS:
         tkwindow = Tk()
         tkwindow.withdraw()
 
+    if PROFILE or PROFILE_OUT:
+        profiler = FrameProfiler(PROFILE_OUT)
+
+    game = sge.game
+    start_time = time.perf_counter()
     try:
         sge.game.start()
     finally:
-        write_to_disk()
-        shutil.rmtree(DATA)
+        if PROFILE_OUT:
+            profiler.save()
+        if HEADLESS:
+            seconds = time.perf_counter() - start_time
+            print(_("Simulated {frames} frames in {seconds:.2f} seconds "
+                    "({fps:.1f} FPS).").format(
+                        frames=game.frames, seconds=seconds,
+                        fps=game.frames / max(seconds, 1e-9)))
+        else:
+            write_to_disk()